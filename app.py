@@ -1,7 +1,7 @@
 # 🍋  Giulia's Law Study Buddy – single-file app.py
 # -------------------------------------------------
 from __future__ import annotations
-import os, re, shutil, csv, datetime, pathlib, html, re as regex
+import os, re, shutil, csv, datetime, pathlib, re as regex
 from pathlib import Path
 from typing import List
 
@@ -13,6 +13,7 @@ from config import AppConfig
 from science.document_manager import DocumentManager
 from science.memory_manager import MemoryManager
 from science.chat_assistant import ChatAssistant
+from science.tracing import span_durations
 from UI.ui_helpers import setup_ui
 
 
@@ -108,7 +109,7 @@ with st.sidebar.expander("🗂️ Class Controls", expanded=False):
         }
 
         st.session_state.global_ids = {
-            (info["source"], info.get("page")): int(cid)
+            (info["source"], info.get("page"), info.get("chunk")): int(cid)
             for cid, info in st.session_state.all_snippets.items()
         }
 
@@ -150,10 +151,8 @@ with st.sidebar.expander("🗂️ Class Controls", expanded=False):
 
                     # instant delete button
                     if col_tr.button("🗑️", key=f"del_{key_base}", help="Delete this file"):
-                        # remove the file
+                        # remove the file; the manifest sync drops only its vectors
                         os.remove(os.path.join(ctx_dir, fn))
-                        # wipe the FAISS index so it rebuilds next prompt
-                        shutil.rmtree(idx_dir, ignore_errors=True)
                         # refresh sidebar + index
                         st.rerun()
 
@@ -193,7 +192,7 @@ with st.sidebar.expander("🗂️ Class Controls", expanded=False):
             col_yes, col_no = st.columns(2)
             if col_yes.button("Yes, delete", key="yes_delete"):
                 shutil.rmtree(ctx_dir, ignore_errors=True)
-                shutil.rmtree(idx_dir, ignore_errors=True)
+                doc_mgr.drop_index(active_class, idx_dir)
                 st.session_state.confirm_delete = False
                 remaining = [d for d in doc_mgr.list_class_folders() if d != active_class]
                 if remaining:
@@ -219,8 +218,8 @@ with st.sidebar.expander("📄 Document controls", expanded=False):
             for uf in uploaded_docs:
                 with open(os.path.join(ctx_dir, uf.name), "wb") as out:
                     out.write(uf.getbuffer())
-            shutil.rmtree(idx_dir, ignore_errors=True)
-            st.success("Files saved! Re-indexing…")
+            # no rmtree: the background sync embeds just the new/changed files
+            st.success("Files saved! Indexing in the background…")
             st.rerun()
         else:
             st.info("No docs to save.")
@@ -230,8 +229,9 @@ with st.sidebar.expander("📄 Document controls", expanded=False):
 
     mode = st.radio(
         "↳ How should I use the selected docs?",
-        ["Prioritise (default)", "Only these docs"],
+        ["Prioritise (default)", "Only these docs", "All classes"],
         horizontal=True,
+        help="“All classes” searches every class’s index at once (doc focus is ignored).",
     )
 
 # 1.1 quick tips
@@ -325,13 +325,90 @@ with st.sidebar.expander("✉️  Contact / Report an issue", expanded=False):
 # ----------------------------------------------------------------------
 # 2. VECTOR STORE (loads cached index or rebuilds)                       
 # ----------------------------------------------------------------------
-vector_store = doc_mgr.ensure_vector_store(ctx_dir, idx_dir, uploaded_docs)
+# syncs run as background jobs; until one publishes, answers use the version we have
+class_index = doc_mgr.ensure_class_index(ctx_dir, idx_dir, background=True)
+_served = doc_mgr.index_version(idx_dir)
+_job = doc_mgr.index_job(active_class)
+_polling = _job is not None and _job.active
+
+
+@st.fragment(run_every=1.0 if _polling else None)
+def index_job_status() -> None:
+    """Poll the class's index job; rerun the whole app when it publishes or ends."""
+    if doc_mgr.index_version(idx_dir) != _served:
+        st.rerun()
+    job = doc_mgr.index_job(active_class)
+    if job is None:
+        return
+    if _polling and not job.active:
+        st.rerun()
+    snap = job.snapshot()
+    if snap["state"] == "queued":
+        st.caption("⏳ Indexing queued…")
+    elif snap["state"] == "running":
+        st.progress(
+            snap["progress"],
+            text=f"Indexing {snap['files_done']}/{snap['files_total']} files · "
+                 f"{snap['chunks_per_s']} chunks/s",
+        )
+        if snap["current"]:
+            st.caption(f"Last parsed: {snap['current']}")
+    elif snap["state"] == "failed":
+        st.error(f"Indexing failed: {snap['failure']}")
+        # not retried on its own until the class's files change
+        if st.button("🔁 Retry indexing", key="retry_index"):
+            doc_mgr.ensure_class_index(ctx_dir, idx_dir, background=True, retry=True)
+            st.rerun()
+    else:
+        st.caption(
+            f"✅ Indexed {snap['files_done']} files · {snap['chunks']} chunks "
+            f"in {snap['elapsed_s']} s"
+        )
+    for name, reason in snap["errors"]:
+        st.caption(f"⚠️ Skipped {name}: {reason}")
+
+
+with st.sidebar:
+    index_job_status()
+
+overlay = doc_mgr.session_overlay(uploaded_docs, ctx_dir)  # unsaved uploads, this session only
+if (class_index is None or class_index.vector_store.index.ntotal == 0) and overlay is not None:
+    class_index, overlay = overlay, None  # nothing saved yet: answer from the uploads alone
+
+if class_index is None or class_index.vector_store.index.ntotal == 0:
+    if _job is not None and _job.active:
+        st.info("⏳ Building this class's index — the page refreshes when it's ready.")
+    else:
+        st.error("⚠️ This class has no documents yet. Upload something first.")
+    st.stop()
+
+vector_store = class_index.vector_store
+_reg = doc_mgr.registry_stats()
+st.sidebar.caption(
+    f"🗃️ Index cache: {_reg['hits']} hits · {_reg['misses']} misses · "
+    f"{_reg['load_seconds']}s loading · {_reg['resident_mb']} MB"
+)
+_emb = doc_mgr.embedding_cache_stats()
+st.sidebar.caption(
+    f"🧮 Embedding cache: {_emb['hit_rate']:.0%} hit rate · "
+    f"{_emb['entries']} vectors · {_emb['size_mb']} MB"
+)
+_sch = doc_mgr.embedding_scheduler_stats()
+if _sch["batches"]:
+    st.sidebar.caption(
+        f"📡 Embedding API: {_sch['texts_per_s']} texts/s · "
+        f"{_sch['retries']} retries · {_sch['rate_limited']} × 429"
+    )
 
 # ----------------------------------------------------------------------
 # 3. MAIN CHAT AREA                                                      
 # ----------------------------------------------------------------------
 st.title("⚖️ Giulia's Law (AI) Study Buddy!")
-assistant = ChatAssistant(API_KEY, cfg, mem_mgr, vector_store)
+assistant = ChatAssistant(
+    API_KEY, cfg, mem_mgr, vector_store, class_index.lexical, class_index.sources,
+    shard_loaders=doc_mgr.shard_loaders() if mode.startswith("All") else None,
+    overlay=overlay,
+)
 
 with st.expander("ℹ️  How this assistant works", expanded=False):
     st.markdown(
@@ -369,10 +446,6 @@ with st.expander("ℹ️  How this assistant works", expanded=False):
     )
 
 user_q = st.chat_input("Ask anything…")
-if user_q:
-    reply = assistant.handle_turn(user_q, sel_docs, mode)
-    st.session_state.chat_history.append({"speaker": "User", "text": user_q})
-    st.session_state.chat_history.append(reply)
 
 # ----------------------------------------------------------------------
 # --------------------------------------------------------------
@@ -393,7 +466,7 @@ if "global_ids" not in st.session_state:
             # global lookup tables
             st.session_state.all_snippets[cid_int] = info
             st.session_state.global_ids[
-                (info["source"], info.get("page"))
+                (info["source"], info.get("page"), info.get("chunk"))
             ] = cid_int
             st.session_state.next_id = max(
                 st.session_state.next_id, cid_int + 1
@@ -402,7 +475,30 @@ if "global_ids" not in st.session_state:
 # ---------------------------------------------------------------
 # 1️⃣  Render chat history
 # ---------------------------------------------------------------
-for entry in st.session_state.chat_history:
+def render_sources(entry: dict) -> None:
+    """“Sources used” expander for one assistant message."""
+    # cited ids + previews were worked out when the reply was created
+    citations = entry.get("citations") or []
+    if citations:
+        with st.expander(
+            "Sources used: " + ", ".join(f"#{c['id']}" for c in citations),
+            expanded=False,
+        ):
+            for c in citations:
+                info = c["info"]
+                if not info:
+                    st.markdown(f"[#{c['id']}] *snippet not found*")
+                    continue
+
+                page = info.get("page")
+                meta = f" (p.{page})" if page is not None else ""
+
+                st.markdown(
+                    f"**[#{c['id']}] {info['source']}{meta}** — {info['preview']}"
+                )
+
+
+def render_entry(entry: dict) -> None:
     role = "user" if entry["speaker"] == "User" else "assistant"
 
     with st.chat_message(role):
@@ -411,29 +507,73 @@ for entry in st.session_state.chat_history:
 
         else:
             st.markdown(entry["text"], unsafe_allow_html=True)
+            render_sources(entry)
+
+
+# only the newest page is drawn; older pages load on request, so a rerun
+# costs the same however long the session is
+history = st.session_state.chat_history
+page_len = 2 * cfg.HISTORY_PAGE_TURNS  # user + assistant message per turn
+shown = min(len(history), page_len * st.session_state.get("history_pages", 1))
+if shown < len(history):
+    hidden_turns = (len(history) - shown + 1) // 2
+    if st.button(f"⬆️ Show earlier messages ({hidden_turns} older turns)", key="history_more"):
+        st.session_state.history_pages = st.session_state.get("history_pages", 1) + 1
+        st.rerun()
 
-            # --- extract the IDs that appear in this answer --------
-            plain = html.unescape(re.sub(r"<.*?>", "", entry["text"]))
-            cited_ids = sorted({int(n) for n in re.findall(r"\[#\s*(\d+)\s*\]", plain)})
-
-            # per-message snippet map
-            snip_map = entry.get("snippets", {})
-
-            if cited_ids:
-                with st.expander(
-                    "Sources used: " + ", ".join(f"#{i}" for i in cited_ids),
-                    expanded=False,
-                ):
-                    for cid in cited_ids:
-                        info = snip_map.get(cid)
-                        if not info:
-                            st.markdown(f"[#{cid}] *snippet not found*")
-                            continue
-
-                        preview = re.sub(r"\s+", " ", info["full"]).strip()[:120] + " …"
-                        page    = info.get("page")
-                        meta    = f" (p.{page})" if page is not None else ""
-
-                        st.markdown(
-                            f"**[#{cid}] {info['source']}{meta}** — {preview}"
-                        )
\ No newline at end of file
+for entry in history[len(history) - shown:]:
+    render_entry(entry)
+
+# ---------------------------------------------------------------
+# 2️⃣  New turn: stream the answer straight into the chat
+# ---------------------------------------------------------------
+if user_q:
+    st.session_state.history_pages = 1  # back to just the newest page next rerun
+    with st.chat_message("user"):
+        st.write(user_q)
+
+    with st.chat_message("assistant"):
+        body = st.empty()
+        turn = assistant.stream_turn(user_q, sel_docs, mode)
+        streamed = body.write_stream(turn)
+        reply = turn.reply
+        if reply["text"] != streamed:           # bad citation / bold prefix fix-up
+            body.markdown(reply["text"], unsafe_allow_html=True)
+        render_sources(reply)
+
+    st.session_state.chat_history.append({"speaker": "User", "text": user_q})
+    st.session_state.chat_history.append(reply)
+    st.session_state.setdefault("turn_metrics", []).append(reply["metrics"])
+    if reply.get("trace"):
+        traces = st.session_state.setdefault("turn_traces", [])
+        traces.append(reply["trace"])
+        del traces[:-cfg.TRACE_PANEL_TURNS]
+
+if st.session_state.get("turn_metrics"):
+    last = st.session_state.turn_metrics[-1]
+    st.sidebar.caption(
+        f"⏱️ Last answer: first token {last['ttft_ms']} ms · total {last['total_ms']} ms"
+    )
+    if "prompt" in last:
+        _p = last["prompt"]
+        st.sidebar.caption(
+            f"🧮 Prompt: {_p['total']} tokens (context {_p['context']}, window {_p['window']}, "
+            f"summary {_p['summary']}) · snippets {_p['snippets_kept']} kept, "
+            f"{_p['snippets_truncated']} cut, {_p['snippets_dropped']} dropped, "
+            f"{_p['snippets_duplicate']} dup"
+        )
+    _sum = mem_mgr.summary_worker.snapshot()
+    st.sidebar.caption(
+        f"📝 Summary: lag {_sum['last_lag_s']} s (max {_sum['max_lag_s']} s) · "
+        f"{_sum['llm_tokens']} tokens · ${_sum['llm_cost']}"
+    )
+
+if st.sidebar.checkbox("Show turn timings", key="show_traces") and st.session_state.get("turn_traces"):
+    st.sidebar.dataframe(
+        [
+            {"turn": t["turn_id"][:6], "kind": t["kind"], "total_ms": t["total_ms"],
+             **span_durations(t)}
+            for t in reversed(st.session_state.turn_traces)
+        ],
+        hide_index=True,
+    )
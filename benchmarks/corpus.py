@@ -0,0 +1,66 @@
+"""Synthetic class folders scaled from a real one, plus query sampling."""
+from __future__ import annotations
+
+import os
+import random
+from typing import Dict, List, Sequence
+
+from science.parallel_loader import parse_files
+
+
+def extract_texts(src_dir: str, chunking, workers: int = 0) -> Dict[str, str]:
+    """{file name: plain text} for every parseable file in ``src_dir``."""
+    paths = sorted(
+        os.path.join(src_dir, f) for f in os.listdir(src_dir)
+        if os.path.isfile(os.path.join(src_dir, f))
+    )
+    out: Dict[str, str] = {}
+    for result in parse_files(paths, chunking, workers=workers):
+        if result.error is None and result.docs:
+            # drop the overlap each chunk shares with the one before it
+            parts, page, end = [], None, 0
+            for d in result.docs:
+                start = d.metadata.get("start_index", 0)
+                if d.metadata.get("page") != page:
+                    page, end = d.metadata.get("page"), 0
+                text = d.page_content
+                parts.append(text[max(0, end - start):] if end > start else text)
+                end = d.metadata.get("end_index", start + len(text))
+            out[os.path.basename(result.path)] = "\n".join(parts)
+    return out
+
+
+def synthesize(texts: Dict[str, str], dest_dir: str, scale: int, seed: int = 0) -> List[str]:
+    """Write ``scale`` perturbed .txt copies of every source text.
+
+    Each copy swaps ~15% of its words for other corpus words, so copies
+    don't collapse into duplicates for BM25, the embeddings, or dedupe.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    rng = random.Random(seed)
+    vocab = sorted({w for t in texts.values() for w in t.split()})
+    paths = []
+    for name, text in sorted(texts.items()):
+        words = text.split(" ")
+        stem = os.path.splitext(name)[0]
+        for copy in range(scale):
+            mutated = [
+                rng.choice(vocab) if rng.random() < 0.15 else w for w in words
+            ]
+            path = os.path.join(dest_dir, f"{stem} ({copy:03d}).txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(" ".join(mutated))
+            paths.append(path)
+    return paths
+
+
+def sample_queries(texts: Sequence[str], n: int, seed: int = 0, length: int = 10) -> List[str]:
+    """``n`` deterministic queries: short word runs lifted from the corpus."""
+    rng = random.Random(seed)
+    pool = [t.split() for t in texts if len(t.split()) > length]
+    queries = []
+    for _ in range(n):
+        words = rng.choice(pool)
+        i = rng.randrange(len(words) - length)
+        queries.append(" ".join(words[i : i + length]))
+    return queries
@@ -0,0 +1,88 @@
+"""Offline stand-ins: hashed embeddings, a stub chat model, and session state."""
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+from typing import Any, Iterator, List
+
+import streamlit as st
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from science.lexical_index import tokenize
+from science.tokens import count_tokens
+
+_CITE_RE = re.compile(r"\[#(\d+)\]")
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words vectors (feature hashing, L2-normalised).
+
+    Texts sharing terms land near each other, so retrieval over these
+    vectors behaves like a (weak) real embedder without any network.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _embed(self, text: str) -> List[float]:
+        vec = [0.0] * self.dim
+        for term in tokenize(text):
+            h = int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+
+class StubChatModel(BaseChatModel):
+    """Answers instantly, citing the first snippet id found in the prompt."""
+
+    answer_words: int = 120
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline-stub"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        cites = [m for msg in messages for m in _CITE_RE.findall(str(msg.content))]
+        tail = f" [#{cites[0]}]." if cites else "."
+        return " ".join(["Stub"] + ["answer"] * (self.answer_words - 1)) + tail
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for word in self._answer(messages).split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    def get_num_tokens(self, text: str) -> int:  # default would fetch a GPT-2 tokenizer
+        return count_tokens(text)
+
+
+class FakeSessionState(dict):
+    """Attribute-style dict standing in for ``st.session_state`` off-server."""
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError as exc:
+            raise AttributeError(key) from exc
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+def install_session_state() -> FakeSessionState:
+    """Point ``st.session_state`` at a fresh FakeSessionState and return it."""
+    state = FakeSessionState()
+    st.session_state = state
+    return state
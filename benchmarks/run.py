@@ -0,0 +1,293 @@
+"""Offline benchmarks: index build, retrieval and full turns as a class grows.
+
+    python -m benchmarks.run                        # PA: real corpus, then 10x and 100x
+    python -m benchmarks.run --cls PA --scales 10 --queries 100
+    python -m benchmarks.run --baseline benchmarks/results/<earlier>.json
+
+Embeddings are feature-hashed and the chat model is a stub, so nothing
+touches the network and the numbers measure this repo's code, not the
+API.  Each case runs in its own subprocess so peak RSS is per case.
+Results are written to benchmarks/results/<UTC time>-<commit>.json.
+
+The one exception is tiktoken, which downloads its ``cl100k_base`` table
+on first use.  It is cached in ``TIKTOKEN_CACHE_DIR`` (default
+``.cache/tiktoken``); run once with network access, or copy the file in,
+before benchmarking offline.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Sequence
+
+# before anything imports tiktoken: keep its encoding table in a known place
+os.environ.setdefault("TIKTOKEN_CACHE_DIR", os.path.join(".cache", "tiktoken"))
+
+from benchmarks.corpus import extract_texts, sample_queries, synthesize
+from benchmarks.fakes import HashEmbeddings, StubChatModel, install_session_state
+from config import AppConfig
+from science.chat_assistant import ChatAssistant
+from science.document_manager import DocumentManager
+from science.index_factory import FAMILIES, index_kind
+from science.memory_manager import MemoryManager
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+_MARKER = "BENCH_RESULT "
+_OFFLINE_KEY = "sk-offline"
+
+
+class OfflineDocumentManager(DocumentManager):
+    """DocumentManager that embeds with a local embedder instead of the API."""
+
+    def __init__(self, cfg: AppConfig, embeddings):
+        super().__init__(_OFFLINE_KEY, cfg)
+        self._offline = embeddings
+
+    def embeddings(self):
+        return self._offline
+
+
+def _percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {"n": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "max": round(ordered[-1], 2)}
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is KiB on Linux
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def _build(doc_mgr: DocumentManager, ctx_dir: str, idx_dir: str):
+    """The class's index; a build that produced nothing is an error, not None."""
+    index = doc_mgr.ensure_class_index(ctx_dir, idx_dir)
+    if index is None or index.vector_store.index.ntotal == 0:
+        reasons = "; ".join(f"{name}: {why}" for name, why in doc_mgr.parse_errors) or "no files"
+        raise RuntimeError(f"index build for {ctx_dir} produced no vectors ({reasons})")
+    return index
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+# ---------------------------------------------------------------------- #
+# One case                                                               #
+# ---------------------------------------------------------------------- #
+def run_case(
+    cls: str, scale: int, n_queries: int, n_turns: int, rerank: bool, seed: int,
+    index_type: str = "flat",
+) -> Dict:
+    """Build, reload, query and chat against one corpus; scale 0 = the real files."""
+    work = tempfile.mkdtemp(prefix="bench-")
+    try:
+        cfg = AppConfig()
+        cfg.RERANK_ENABLED = rerank
+        cfg.INDEX_TYPE = index_type
+        cfg.TRACE_ENABLED = False
+        cfg.EMBED_CACHE_DIR = os.path.join(work, "embed-cache")
+        cfg.PARSE_CACHE_PATH = os.path.join(work, "parsed.sqlite")
+        chunking = (cfg.CHUNK_TOKENS, cfg.CHUNK_OVERLAP, cfg.TOKEN_ENCODING)
+
+        src = os.path.join(cfg.BASE_CTX_DIR, cls)
+        name = cls if scale == 0 else f"{cls}-x{scale}"
+        if scale == 0:
+            ctx_dir = src
+        else:
+            ctx_dir = os.path.join(work, "ctx", name)
+            synthesize(extract_texts(src, chunking, cfg.PARSE_WORKERS), ctx_dir, scale, seed)
+        idx_dir = os.path.join(work, "idx", f"{cfg.INDEX_PREFIX}{name}")
+
+        state = install_session_state()
+        doc_mgr = OfflineDocumentManager(cfg, HashEmbeddings())
+
+        # index lifecycle: cold build, reload from disk, no-op resync
+        _, build_s = _timed(_build, doc_mgr, ctx_dir, idx_dir)
+        doc_mgr.invalidate_index(name)
+        _, reload_s = _timed(_build, doc_mgr, ctx_dir, idx_dir)
+        index, noop_s = _timed(_build, doc_mgr, ctx_dir, idx_dir)
+        store = index.vector_store
+
+        # chat stack with the stub model in place of OpenAI
+        stub = StubChatModel()
+        state.active_class = name
+        state.memory_buckets = {}
+        memory = MemoryManager(_OFFLINE_KEY, cfg)
+        state.summary_memory.llm = stub
+        assistant = ChatAssistant(_OFFLINE_KEY, cfg, memory, store, index.lexical, index.sources)
+        assistant.llm = stub
+
+        texts = [store.docstore.search(i).page_content for i in store.index_to_docstore_id.values()]
+        queries = sample_queries(texts, n_queries, seed)
+        sources = sorted(os.listdir(ctx_dir))
+        rng = random.Random(seed)
+
+        retrieval: Dict[str, List[float]] = {"global": [], "prioritise": [], "only": []}
+        for q in queries:
+            focus = rng.sample(sources, min(2, len(sources)))
+            for key, sel, mode in (
+                ("global", [], "Prioritise (default)"),
+                ("prioritise", focus, "Prioritise (default)"),
+                ("only", focus, "Only selected"),
+            ):
+                _, secs = _timed(assistant._retrieve, q, sel, mode)
+                retrieval[key].append(secs * 1000)
+
+        turn_ms, prompt_tokens, context_tokens = [], [], []
+        for q in queries[:n_turns]:
+            reply, secs = _timed(assistant.handle_turn, q)
+            turn_ms.append(secs * 1000)
+            prompt = reply.get("metrics", {}).get("prompt")
+            if prompt:
+                prompt_tokens.append(prompt["total"])
+                context_tokens.append(prompt["context"])
+
+        return {
+            "case": name,
+            "scale": scale,
+            "files": len(sources),
+            "corpus_mb": round(
+                sum(os.path.getsize(os.path.join(ctx_dir, f)) for f in sources) / 2**20, 2
+            ),
+            "chunks": store.index.ntotal,
+            "index": index_kind(store.index),
+            "build_s": round(build_s, 3),
+            "reload_s": round(reload_s, 3),
+            "noop_sync_s": round(noop_s, 4),
+            "retrieval_ms": {k: _percentiles(v) for k, v in retrieval.items()},
+            "turn_ms": _percentiles(turn_ms),
+            "prompt_tokens": _percentiles(prompt_tokens),
+            "context_tokens": _percentiles(context_tokens),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------- #
+# Driver                                                                 #
+# ---------------------------------------------------------------------- #
+def _run_isolated(args, scale: int) -> Dict:
+    cmd = [
+        sys.executable, "-m", "benchmarks.run", "--case", str(scale),
+        "--cls", args.cls, "--queries", str(args.queries), "--turns", str(args.turns),
+        "--seed", str(args.seed), "--index", args.index,
+    ] + (["--rerank"] if args.rerank else [])
+    out = subprocess.run(cmd, capture_output=True, text=True)
+    for line in out.stdout.splitlines():
+        if line.startswith(_MARKER):
+            return json.loads(line[len(_MARKER):])
+    raise RuntimeError(f"case x{scale} failed:\n{out.stderr[-4000:]}")
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(results: Dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {c["case"]: c for c in json.load(f)["cases"]}
+    metrics = [
+        ("build_s", lambda c: c["build_s"]),
+        ("reload_s", lambda c: c["reload_s"]),
+        ("retrieval p95", lambda c: c["retrieval_ms"]["global"].get("p95")),
+        ("turn p95", lambda c: c["turn_ms"].get("p95")),
+        ("prompt p95", lambda c: c["prompt_tokens"].get("p95")),
+        ("rss MB", lambda c: c["peak_rss_mb"]["self"]),
+    ]
+    print(f"\nvs {os.path.basename(baseline_path)}")
+    for case in results["cases"]:
+        old = baseline.get(case["case"])
+        if old is None:
+            continue
+        deltas = []
+        for label, get in metrics:
+            a, b = get(old), get(case)
+            if a and b is not None:
+                deltas.append(f"{label} {100 * (b - a) / a:+.0f}%")
+        print(f"  {case['case']:<14} " + " · ".join(deltas))
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cls", default="PA", help="class folder under classes_context")
+    parser.add_argument("--scales", default="10,100", help="synthetic multiples of the real corpus")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rerank", action="store_true", help="load the cross-encoder too")
+    parser.add_argument("--index", default="flat", choices=FAMILIES, help="FAISS index family")
+    parser.add_argument("--in-process", action="store_true", help="no subprocess per case")
+    parser.add_argument("--baseline", help="earlier results JSON to diff against")
+    parser.add_argument("--out", help="results path (default: benchmarks/results/…)")
+    parser.add_argument("--case", type=int, help=argparse.SUPPRESS)  # subprocess entry point
+    args = parser.parse_args(argv)
+
+    if args.case is not None:
+        result = run_case(args.cls, args.case, args.queries, args.turns, args.rerank, args.seed,
+                          args.index)
+        print(_MARKER + json.dumps(result), flush=True)
+        return
+
+    cases = []
+    for scale in [0] + [int(s) for s in args.scales.split(",") if s.strip()]:
+        if args.in_process:
+            case = run_case(args.cls, scale, args.queries, args.turns, args.rerank, args.seed,
+                            args.index)
+        else:
+            case = _run_isolated(args, scale)
+        cases.append(case)
+        print(
+            f"{case['case']:<14} files={case['files']:<5} chunks={case['chunks']:<7} "
+            f"build={case['build_s']:.2f}s reload={case['reload_s']:.2f}s "
+            f"retrieval p50/p95={case['retrieval_ms']['global'].get('p50')}/"
+            f"{case['retrieval_ms']['global'].get('p95')} ms "
+            f"prompt p95={case['prompt_tokens'].get('p95')} tok "
+            f"rss={case['peak_rss_mb']['self']} MB"
+        )
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    results = {
+        "commit": _commit(),
+        "created": now.isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "params": {k: v for k, v in vars(args).items() if k not in ("case", "out", "baseline")},
+        "cases": cases,
+    }
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{now:%Y%m%dT%H%M%SZ}-{results['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nwrote {out}")
+    if args.baseline:
+        _compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,23 +11,86 @@ class AppConfig:
     INDEX_PREFIX: str = "faiss_"
     CTX_DIR = None  # will be set after the user picks a class
     INDEX_DIR = None
+    INDEX_CACHE_MAX_MB: int = 512  # shared in-process FAISS cache, all classes
+
+    # Chunking / indexing
+    CHUNK_TOKENS: int = 350
+    CHUNK_OVERLAP: int = 50
+    TOKEN_ENCODING: str = "cl100k_base"
+    INDEX_ADD_BATCH: int = 256  # chunks embedded + added per FAISS call
+    PARSE_WORKERS: int = 0  # 0 → os.cpu_count()
+    PARSE_TIMEOUT_S: int = 300  # per file
+    PARSE_CACHE_PATH: str = ".cache/parsed.sqlite"  # loader output by content hash
+    PARSE_CACHE_MAX_MB: int = 512
+    INDEX_JOB_WORKERS: int = 1  # background syncs running at once (all classes)
+
+    # OCR (scanned PDF pages + image uploads; needs the tesseract binary)
+    OCR_LANG: str = "eng"
+    OCR_MIN_CHARS: int = 20  # pages with less extractable text than this are OCR'd
+    OCR_WORKERS: int = 0  # tesseract processes per file, 0 → os.cpu_count(), or 1 inside a parse worker
+    OCR_CACHE_DIR: str = ".cache/ocr"
+
+    # FAISS index family: flat | hnsw | ivf_flat | ivf_pq | sq8
+    INDEX_TYPE: str = "flat"
+    INDEX_TYPES: dict = field(default_factory=dict)  # per-class overrides, {"PA": "hnsw"}
+    HNSW_M: int = 32
+    HNSW_EF_SEARCH: int = 64
+    IVF_NLIST: int = 0  # 0 → ~4·√n at build time
+    IVF_NPROBE: int = 16
+    PQ_M: int = 0  # 0 → d/16 sub-quantizers
+    INDEX_MIN_TRAIN: int = 2_000  # IVF classes stay flat below this many chunks
 
     # Retrieval
-    FIRST_K: int = 30
+    FIRST_K: int = 20  # was 30 before BM25 fusion recovered exact-term recall
     FINAL_K: int = 10
     RELEVANCE_THRESHOLD: float = 0.8
+    RRF_K: int = 60  # reciprocal-rank-fusion constant (dense + BM25)
+    SHARD_WORKERS: int = 4  # "All classes" mode: shards searched in parallel
+    SHARD_BUDGET_MS: int = 500  # shards slower than this are left out of the answer
+    SNIPPET_STORE_MAX_MB: int = 64  # cited passage text, shared by all sessions
+
+    # Reranking (FIRST_K candidates → FINAL_K context)
+    RERANK_ENABLED: bool = True
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_BATCH: int = 16
+    RERANK_BUDGET_MS: int = 800
+
+    # Prompt budget (tokens, counted locally with TOKEN_ENCODING)
+    PROMPT_MAX_TOKENS: int = 8_000
+    PROMPT_SUMMARY_TOKENS: int = 600
+    PROMPT_CONTEXT_TOKENS: int = 4_500
+    PROMPT_WINDOW_TOKENS: int = 1_500
+    PROMPT_FACTS_TOKENS: int = 400
 
     # Models
     LLM_MODEL: str = "gpt-4.1-mini"
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
     SUMMARY_MODEL: str = "gpt-4.1-mini"
 
+    # Embedding requests
+    EMBED_API_BASE: str | None = None  # e.g. a local stand-in server for offline runs
+    EMBED_BATCH_TOKENS: int = 32_000
+    EMBED_CONCURRENCY: int = 4
+
+    # Embedding cache
+    EMBED_CACHE_DIR: str = ".cache/embeddings"
+    EMBED_CACHE_MAX_MB: int = 256
+
     # Memory
     SESSION_WINDOW: int = 8
     MAX_TOKEN_LIMIT: int = 800
 
+    # Tracing (per-turn spans → rotating JSONL; no prompt/answer text)
+    TRACE_ENABLED: bool = True
+    TRACE_PATH: str = ".cache/traces/turns.jsonl"
+    TRACE_MAX_MB: int = 10
+    TRACE_BACKUPS: int = 3
+    TRACE_PANEL_TURNS: int = 10
+
     # UI
     GREETING_COOLDOWN: int = 3600  # seconds
     TONES: tuple[str, ...] = ("funny", "nice")
+    HISTORY_PAGE_TURNS: int = 10  # turns drawn per page of chat history
 
     # Regex
     INLINE_RE: re.Pattern = field(default_factory=lambda: re.compile(r"\[\s*#(\d+)\s*\]"))
@@ -1,9 +1,11 @@
 """Core retrieval-augmented generation workflow."""
 from __future__ import annotations
 
+import html
 import os
 import re
-from typing import Dict, List, Tuple
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
 
 import streamlit as st
 from langchain_core.messages import SystemMessage, HumanMessage
@@ -12,7 +14,67 @@ from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
 from config import AppConfig
+from science.lexical_index import LexicalIndex
 from science.memory_manager import MemoryManager
+from science.prompt_budget import PromptBuilder, PromptUsage
+from science.reranker import get_reranker
+from science.retrieval import Hit, SourceIndex, embed_query, hybrid_search, merge_hits
+from science.shard_search import ShardLoader, get_shard_pool, search_shards
+from science.snippet_store import get_snippet_store
+from science.tokens import count_tokens
+from science.tracing import Trace, get_trace_sink
+
+
+class TurnStream:
+    """Iterable of answer tokens; `reply` is set once iteration finishes.
+
+    Citations are checked as they stream: the first [#n] that doesn't match
+    a known snippet stops the LLM stream early, because that answer is
+    going to be replaced anyway.  Timing lands in ``reply["metrics"]``.
+    """
+
+    def __init__(
+        self,
+        tokens: Iterator[str],
+        finish: Callable[[str, bool], Dict],
+        citation_guard: Callable[[int], bool] | None = None,
+        inline_re: re.Pattern | None = None,
+    ):
+        self._tokens = tokens
+        self._finish = finish
+        self._guard = citation_guard
+        self._inline_re = inline_re
+        self.reply: Dict | None = None
+        self.ttft_ms: float | None = None
+        self.total_ms: float | None = None
+
+    @classmethod
+    def fixed(cls, reply: Dict) -> "TurnStream":
+        return cls(iter([reply["text"]]), lambda text, aborted: reply)
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        text, scan_from, aborted = "", 0, False
+        for token in self._tokens:
+            if self.ttft_ms is None:
+                self.ttft_ms = (time.perf_counter() - start) * 1000
+            text += token
+            yield token
+            if self._guard is not None:
+                for m in self._inline_re.finditer(text, scan_from):
+                    scan_from = m.end()
+                    if not self._guard(int(m.group(1))):
+                        aborted = True
+                scan_from = max(scan_from, len(text) - 16)  # a cite is < 16 chars
+                if aborted:
+                    getattr(self._tokens, "close", lambda: None)()  # stop the LLM stream
+                    break
+        self.total_ms = (time.perf_counter() - start) * 1000
+        self.reply = self._finish(text, aborted)
+        self.reply.setdefault("metrics", {}).update(
+            ttft_ms=round(self.ttft_ms or self.total_ms),
+            total_ms=round(self.total_ms),
+        )
 
 
 class ChatAssistant:
@@ -24,45 +86,42 @@ class ChatAssistant:
         cfg: AppConfig,
         memory: MemoryManager,
         vector_store: FAISS,
+        lexical_index: LexicalIndex | None = None,
+        source_index: SourceIndex | None = None,
+        shard_loaders: Dict[str, ShardLoader] | None = None,
+        overlay=None,
     ):
         self.cfg = cfg
         self.memory = memory
         self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.source_index = source_index or SourceIndex(vector_store)
+        self.shard_loaders = shard_loaders or {}
+        self.overlay = overlay  # ClassIndex of this session's unsaved uploads
+        self.reranker = (
+            get_reranker(cfg.RERANK_MODEL, cfg.RERANK_BATCH, cfg.RERANK_BUDGET_MS)
+            if cfg.RERANK_ENABLED
+            else None
+        )
         self.llm = ChatOpenAI(api_key=api_key, model=cfg.LLM_MODEL, temperature=0.0)
-
-    # ------------------------------------------------------------------ #
-    # Public API                                                         #
-    # ------------------------------------------------------------------ #
-      
-    # ------------------------------------------------------------------ #
-    # NEW helper for “background:” turns
-    # ------------------------------------------------------------------ 
-    
-    def _handle_background(self, text: str) -> Dict:
-        """
-        Respond with general knowledge.  No citations expected.
-        """
-        system = (
-            "Background mode: you may answer from your general knowledge. "
-            "Begin your response with **“Background (uncited):”**."
+        self.prompt_builder = PromptBuilder(
+            cfg.PROMPT_MAX_TOKENS,
+            summary_tokens=cfg.PROMPT_SUMMARY_TOKENS,
+            context_tokens=cfg.PROMPT_CONTEXT_TOKENS,
+            window_tokens=cfg.PROMPT_WINDOW_TOKENS,
+            facts_tokens=cfg.PROMPT_FACTS_TOKENS,
+            encoding=cfg.TOKEN_ENCODING,
         )
-        messages = [SystemMessage(content=system), HumanMessage(content=text)]
-        response = self.llm.invoke(messages).content
-
-        # ── ensure the prefix is actually bold ──────────────────────────
-        plain_prefix = "Background (uncited):"
-        if response.startswith(plain_prefix):
-            response = f"**{plain_prefix}**" + response[len(plain_prefix):]
-        elif response.lower().startswith(plain_prefix.lower()):
-            # handle lowercase/language-model variations
-            idx = len(plain_prefix)
-            response = f"**{response[:idx]}**" + response[idx:]
-
-        return {"speaker": "Assistant", "text": response, "snippets": {}}
-
+        self.trace_sink = (
+            get_trace_sink(cfg.TRACE_PATH, cfg.TRACE_MAX_MB, cfg.TRACE_BACKUPS)
+            if cfg.TRACE_ENABLED
+            else None
+        )
+        self.snippet_store = get_snippet_store(cfg.SNIPPET_STORE_MAX_MB)
+        self._trace = Trace()
 
     # ------------------------------------------------------------------ #
-    # Replacement for handle_turn (add background support)
+    # Public API                                                         #
     # ------------------------------------------------------------------ #
     def handle_turn(
         self,
@@ -70,89 +129,154 @@ class ChatAssistant:
         sel_docs: List[str] | None = None,
         mode: str = "Prioritise (default)",
     ) -> Dict:
+        """Blocking variant of `stream_turn`: returns the finished reply."""
+        turn = self.stream_turn(user_text, sel_docs, mode)
+        for _ in turn:
+            pass
+        return turn.reply
+
+    def stream_turn(
+        self,
+        user_text: str,
+        sel_docs: List[str] | None = None,
+        mode: str = "Prioritise (default)",
+    ) -> "TurnStream":
+        """Start a turn; iterate the result for answer tokens as they arrive."""
         low = user_text.lower()
 
         # 1️⃣ prefix commands ------------------------------------------------
         if low.startswith("remember:"):
             self._remember_fact(user_text, permanent=True)
-            return {"speaker": "Assistant", "text": "✅ Fact remembered permanently."}
+            return TurnStream.fixed({"speaker": "Assistant", "text": "✅ Fact remembered permanently."})
 
         if low.startswith("memo:"):
             self._remember_fact(user_text, permanent=False)
-            return {"speaker": "Assistant", "text": "ℹ️ Session-only fact added."}
+            return TurnStream.fixed({"speaker": "Assistant", "text": "ℹ️ Session-only fact added."})
 
         if low.startswith("role:"):
             persona = user_text.split(":", 1)[1].strip()
             st.session_state.persona = persona
-            return {"speaker": "Assistant", "text": f"👤 Persona set: {persona}"}
+            return TurnStream.fixed({"speaker": "Assistant", "text": f"👤 Persona set: {persona}"})
 
         if low.startswith("background:"):
             stripped = user_text.split(":", 1)[1].strip()
-            return self._handle_background(stripped)
+            return self._stream_background(stripped)
 
         # 2️⃣ strict-RAG retrieval ------------------------------------------
-        docs, snippet_map = self._retrieve(user_text, sel_docs or [], mode)
+        trace = self._trace = Trace("rag", mode=mode.split()[0], selected=len(sel_docs or []))
+        with trace.span("retrieval") as span:
+            docs, snippet_map = self._retrieve(user_text, sel_docs or [], mode)
+            span["hits"] = len(docs)
 
         # guard when nothing to cite
         if not (docs or st.session_state.memory_facts or st.session_state.session_facts):
-            return {
+            return TurnStream.fixed({
                 "speaker": "Assistant",
                 "text": (
                     "I don’t have enough information in the provided material to answer that.\n\n"
                     "(If you’d like general background on this topic, "
                     "type “background:” before your question.)"
                 ),
-            }
-
-        print("🔹WINDOW right now:")
-        for m in self.memory.window.load_memory_variables({}).get("history", []):
-            who = "H" if isinstance(m, HumanMessage) else "A"
-            print(f" {who:1}:", m.content[:60])
-        print("🔹END WINDOW\n")
-
+            })
 
         # 3️⃣ build prompt & call LLM ---------------------------------------
-        messages = self._build_messages(
-            user_text=user_text,
-            docs=docs,
-            snippet_map=snippet_map,
-            persona=st.session_state.persona,
-        )
+        with trace.span("prompt_build") as span:
+            messages, usage = self._build_messages(
+                user_text=user_text,
+                docs=docs,
+                snippet_map=snippet_map,
+                persona=st.session_state.persona,
+            )
+            span.update(tokens=usage.total, snippets=len(usage.kept),
+                        dropped=len(usage.dropped) + len(usage.duplicates))
+        # only what the model actually saw can be cited
+        snippet_map = {cid: snippet_map[cid] for cid in usage.kept}
 
-        # ─── DEBUG 2: what prompt are we about to send? ─────────────
-        print("🔸PROMPT ORDER (top→bottom)")
-        for i, m in enumerate(messages):
-            tag = type(m).__name__[:2]
-            print(f"{i:02d} {tag}: ", m.content.replace("\n", " ")[:70])
-        print("🔸END PROMPT\n")
+        known = st.session_state.get("all_snippets", {})
+        current = st.session_state.active_class          # whichever class we’re in
 
+        def _finish(response: str, aborted: bool) -> Dict:
+            # 💾  store the pair so the next run can see it
+            with trace.span("memory_save"):
+                self.memory.save_turn(user_text, response)
 
-        response = self.llm.invoke(messages).content
+            st.session_state.memory_buckets[current] = (
+                self.memory.window,
+                self.memory.summary,
+            )
 
-        # 💾  store the pair so the next run can see it
-        self.memory.save_turn(user_text, response)
+            if aborted or "[#]" in response:
+                response = ("I don’t have enough information in the provided "
+                            "material to answer that.")
 
-        # now apply your citation-sanity block
-        bad_cites = [
-            n for n in self._extract_citation_numbers(response)
-            if n not in st.session_state.get("all_snippets", {})
-        ]
+            return {
+                "speaker": "Assistant",
+                "text": response,
+                "snippets": snippet_map,
+                "citations": self._citations(response, {**known, **snippet_map}),
+                "metrics": {"prompt": usage.as_dict()},
+                "trace": self._write_trace(trace, aborted=aborted),
+            }
 
-        current = st.session_state.active_class          # whichever class we’re in
-        st.session_state.memory_buckets[current] = (
-            self.memory.window,
-            self.memory.summary,
+        return TurnStream(
+            self._llm_tokens(messages, trace),
+            _finish,
+            citation_guard=lambda n: n in known,
+            inline_re=self.cfg.INLINE_RE,
         )
 
-        if bad_cites or "[#]" in response:
-            response = ("I don’t have enough information in the provided "
-                        "material to answer that.")
+    # ------------------------------------------------------------------ #
+    # “background:” turns                                                #
+    # ------------------------------------------------------------------ #
+    def _stream_background(self, text: str) -> "TurnStream":
+        """
+        Respond with general knowledge.  No citations expected.
+        """
+        system = (
+            "Background mode: you may answer from your general knowledge. "
+            "Begin your response with **“Background (uncited):”**."
+        )
+        messages = [SystemMessage(content=system), HumanMessage(content=text)]
+        trace = self._trace = Trace("background")
+
+        def _finish(response: str, aborted: bool) -> Dict:
+            # ── ensure the prefix is actually bold ──────────────────────────
+            plain_prefix = "Background (uncited):"
+            if response.startswith(plain_prefix):
+                response = f"**{plain_prefix}**" + response[len(plain_prefix):]
+            elif response.lower().startswith(plain_prefix.lower()):
+                # handle lowercase/language-model variations
+                idx = len(plain_prefix)
+                response = f"**{response[:idx]}**" + response[idx:]
+
+            return {"speaker": "Assistant", "text": response, "snippets": {},
+                    "trace": self._write_trace(trace, aborted=aborted)}
+
+        return TurnStream(self._llm_tokens(messages, trace), _finish)
+
+    def _llm_tokens(self, messages, trace: Trace) -> Iterator[str]:
+        """LLM stream that records one "llm" span, however iteration ends."""
+        start, first, parts = trace.now_ms(), None, []
+        try:
+            for chunk in self.llm.stream(messages):
+                if chunk.content:
+                    if first is None:
+                        first = trace.now_ms() - start
+                    parts.append(chunk.content)
+                    yield chunk.content
+        finally:
+            trace.record(
+                "llm", start, trace.now_ms() - start,
+                model=self.cfg.LLM_MODEL,
+                ttft_ms=round(first, 1) if first is not None else None,
+                output_tokens=count_tokens("".join(parts), self.cfg.TOKEN_ENCODING),
+            )
 
-        return {
-            "speaker": "Assistant",
-            "text": response,
-            "snippets": snippet_map,
-        }
+    def _write_trace(self, trace: Trace, **attrs) -> Dict:
+        trace.attrs.update(attrs)
+        if self.trace_sink is None:
+            return trace.to_dict()
+        return self.trace_sink.write(trace)
 
     # ------------------------------------------------------------------ #
     # Retrieval + snippet handling                                       #
@@ -163,58 +287,127 @@ class ChatAssistant:
         """Returns (docs, snippet_map)."""
         FIRST_K, FINAL_K, RELEVANCE_THRESHOLD = self.cfg.FIRST_K, self.cfg.FINAL_K, self.cfg.RELEVANCE_THRESHOLD
 
-        full_ret = self.vector_store.as_retriever(
-            search_kwargs={
-                "k": FIRST_K,
-                "score_threshold": RELEVANCE_THRESHOLD,   
-            }
-        )
-
-        # optional filter retriever
+        # one query embedding (LRU-cached) and one BM25 pass per turn
+        cache = getattr(self.vector_store.embeddings, "cache", None)
+        with self._trace.span("embed_query") as span:
+            hits_before = cache.stats.query_hits if cache is not None else 0
+            qvec = embed_query(self.vector_store, query)
+            span["cache_hit"] = cache is not None and cache.stats.query_hits > hits_before
+
+        if mode.startswith("All") and self.shard_loaders:
+            with self._trace.span("shards", shards=len(self.shard_loaders)) as span:
+                candidates, stats = search_shards(
+                    get_shard_pool(self.cfg.SHARD_WORKERS),
+                    self.shard_loaders,
+                    query,
+                    qvec,
+                    FIRST_K,
+                    self.cfg.SHARD_BUDGET_MS,
+                    threshold=RELEVANCE_THRESHOLD,
+                    rrf_k=self.cfg.RRF_K,
+                )
+                span.update(answered=len(stats.answered), late=stats.late,
+                            failed=sorted(stats.failed), shard_ms=stats.ms)
+            candidates = merge_hits(
+                [candidates, self._search_overlay(query, qvec)], FIRST_K, self.cfg.RRF_K
+            )
+            return self._snippets(self._top(query, candidates, FINAL_K))
+
+        with self._trace.span("lexical") as span:
+            lex_scores = self.lexical_index.score_all(query) if self.lexical_index else None
+            span["matched"] = len(lex_scores or ())
+
+        def _search(positions=None, allowed=None) -> List[Hit]:
+            with self._trace.span("search", restricted=positions is not None):
+                return hybrid_search(
+                    self.vector_store,
+                    self.lexical_index,
+                    query,
+                    qvec,
+                    FIRST_K,
+                    threshold=RELEVANCE_THRESHOLD,
+                    positions=positions,
+                    allowed_ids=allowed,
+                    rrf_k=self.cfg.RRF_K,
+                    lex_scores=lex_scores,
+                )
+
+        # optional restriction to the selected files (FAISS ID selector)
+        focus = None
         if sel_docs:
-            sel_set = set(sel_docs)
-
-            def _filt(meta):
-                src = meta.get("source") or meta.get("file_path") or ""
-                return os.path.basename(src) in sel_set
-
-            focus_ret = self.vector_store.as_retriever(
-                search_kwargs={
-                    "k": FIRST_K,
-                    "filter": _filt,
-                    "score_threshold": RELEVANCE_THRESHOLD   
-                }
+            focus = (self.source_index.positions(sel_docs), self.source_index.ids(sel_docs))
+
+        if mode.startswith("Only") and focus:
+            hits = self._top(query, _search(*focus), FINAL_K)
+        elif mode.startswith("Prioritise") and focus:
+            primary = self._top(query, _search(*focus), FINAL_K)
+            seen = {h.doc_id for h in primary}
+            wider = merge_hits(
+                [_search(), self._search_overlay(query, qvec)], FIRST_K, self.cfg.RRF_K
             )
+            secondary = self._top(
+                query,
+                [h for h in wider if h.doc_id not in seen],
+                max(0, FINAL_K - len(primary)),
+            )
+            hits = primary + secondary
         else:
-            focus_ret = None
-
-        if mode.startswith("Only") and focus_ret:
-            docs = focus_ret.invoke(query)
-        elif mode.startswith("Prioritise") and focus_ret:
-            primary = focus_ret.invoke(query)
-            secondary = [
-                d for d in full_ret.invoke(query) if d not in primary
-            ][: max(0, FINAL_K - len(primary))]
-            docs = primary + secondary
-        else:
-            docs = full_ret.invoke(query)
+            # one global fusion: uploads compete with class chunks on relevance
+            candidates = merge_hits(
+                [_search(), self._search_overlay(query, qvec)], FIRST_K, self.cfg.RRF_K
+            )
+            hits = self._top(query, candidates, FINAL_K)
+        return self._snippets(hits)
+
+    def _search_overlay(self, query: str, qvec) -> List[Hit]:
+        """Hits from the session-upload overlay, tagged with its shard name.
+
+        Searched with the class's query vector (same embedding model), so
+        `merge_hits` can rank them against class hits by distance.
+        """
+        if self.overlay is None:
+            return []
+        with self._trace.span("overlay", chunks=self.overlay.vector_store.index.ntotal):
+            hits = hybrid_search(
+                self.overlay.vector_store,
+                self.overlay.lexical,
+                query,
+                qvec,
+                self.cfg.FIRST_K,
+                threshold=self.cfg.RELEVANCE_THRESHOLD,
+                rrf_k=self.cfg.RRF_K,
+            )
+        for h in hits:
+            h.shard = self.overlay.name
+        return hits
+
+    def _snippets(self, hits: List[Hit]) -> Tuple[List[Document], Dict]:
+        """(docs, snippet_map) for the final hits, assigning citation ids."""
+        docs = [h.doc for h in hits]
+        active = st.session_state.get("active_class")
 
         snippet_map: Dict[int, Dict] = {}
         context_parts: List[str] = []
 
-        for d in docs:
+        for h, d in zip(hits, docs):
             file_name = os.path.basename(
                 d.metadata.get("source") or d.metadata.get("file_path", "-unknown-")
             )
+            if h.shard and h.shard != active:  # cross-class hit: say where it's from
+                file_name = f"{h.shard} / {file_name}"
             page_num = d.metadata.get("page")
-            cid = self._assign_citation_id(file_name, page_num)
+            chunk_no = d.metadata.get("chunk")
+            cid = self._assign_citation_id(file_name, page_num, chunk_no)
 
             context_parts.append(f"[#{cid}]\n{d.page_content}")
+            # text goes to the shared store once; messages keep the reference
+            key = (h.shard or active, h.doc_id)
+            self.snippet_store.put(key, d.page_content.strip())
             snippet_map[cid] = {
-                "preview": re.sub(r"\s+", " ", d.page_content.strip())[:160] + "…",
-                "full": d.page_content.strip(),
+                "key": key,
                 "source": file_name,
                 "page": page_num,
+                "chunk": chunk_no,
             }
 
         st.session_state.setdefault("all_snippets", {}).update(snippet_map)
@@ -222,6 +415,18 @@ class ChatAssistant:
         return docs, snippet_map
     
 
+    def _top(self, query: str, hits: List[Hit], n: int) -> List[Hit]:
+        """Best `n` of the first-stage candidates (cross-encoder if enabled)."""
+        if self.reranker is None:
+            return hits[:n]
+        stats = self.reranker.stats
+        with self._trace.span("rerank", candidates=len(hits)) as span:
+            hits_before, scored_before = stats.cache_hits, stats.scored
+            order = self.reranker.rerank(query, [h.doc.page_content for h in hits], n)
+            span.update(cache_hits=stats.cache_hits - hits_before,
+                        scored=stats.scored - scored_before)
+        return [hits[i] for i in order]
+
     # ------------------------------------------------------------------ #
     # Message construction                                               #
     # ------------------------------------------------------------------ #
@@ -231,8 +436,8 @@ class ChatAssistant:
         docs: List[Document],
         snippet_map: Dict[int, Dict],
         persona: str | None,
-    ):
-        """Combine system prompt, memories, context, and user query."""
+    ) -> Tuple[List, PromptUsage]:
+        """Combine system prompt, memories, context, and user query within budget."""
         sys_prompt = (
             """
             You are Giulia’s friendly but meticulous law-exam assistant.
@@ -261,42 +466,39 @@ class ChatAssistant:
         if persona:
             sys_prompt += f" Adopt persona: {persona}."
 
-        messages = [SystemMessage(content=sys_prompt)]
-
-        summary_text = self.memory.summary.load_memory_variables({}).get("history", "")
+        summary_text = self.memory.latest_summary()
         # skip early-stage output that still contains raw prefixes
         if summary_text.startswith("Human:") or summary_text.startswith("AI:"):
             summary_text = ""
 
-        if summary_text:
-            messages.append(SystemMessage(content=summary_text))
-
-        # context from docs
-        if snippet_map:
-            joined = "\n\n".join(
-                f"[#{cid}]\n{info['full']}" for cid, info in snippet_map.items()
-            )
-            messages.append(SystemMessage(content=f"Context:\n{joined}"))
-
         # ---- recent 8-turn window  (freshest, so highest priority) ----
         window_msgs = self.memory.window.load_memory_variables({}).get("history", [])
-        messages.extend(window_msgs)
 
         # stored facts
-        for fact in st.session_state.memory_facts:
-            messages.append(SystemMessage(content=f"Remembered fact: {fact}"))
-        for fact in st.session_state.session_facts:
-            messages.append(SystemMessage(content=f"Session fact: {fact}"))
-
-        messages.append(HumanMessage(content=user_text))
-        return messages
+        facts = [f"Remembered fact: {fact}" for fact in st.session_state.memory_facts]
+        facts += [f"Session fact: {fact}" for fact in st.session_state.session_facts]
+
+        # snippet_map is in rank order, so the budget trims from the bottom
+        texts = self.snippet_store.get_many(info["key"] for info in snippet_map.values())
+        return self.prompt_builder.build(
+            system=sys_prompt,
+            summary=summary_text,
+            snippets=[
+                (cid, texts[info["key"]]) for cid, info in snippet_map.items() if info["key"] in texts
+            ],
+            window=window_msgs,
+            facts=facts,
+            user_text=user_text,
+        )
 
     # ------------------------------------------------------------------ #
     # Helpers                                                            #
     # ------------------------------------------------------------------ #
-    def _assign_citation_id(self, file_name: str, page: int | None) -> int:
-        """Stable [#id] per (file,page) across the whole Streamlit session."""
-        key = (file_name, page)
+    def _assign_citation_id(
+        self, file_name: str, page: int | None, chunk: int | None = None
+    ) -> int:
+        """Stable [#id] per (file, page, chunk) across the whole Streamlit session."""
+        key = (file_name, page, chunk)
         if key not in st.session_state.global_ids:
             st.session_state.global_ids[key] = st.session_state.next_id
             st.session_state.next_id += 1
@@ -307,5 +509,28 @@ class ChatAssistant:
         bucket = "memory_facts" if permanent else "session_facts"
         st.session_state[bucket].append(fact)
 
+    def _citations(self, text: str, snippet_map: Dict[int, Dict]) -> List[Dict]:
+        """Cited ids with source + preview, worked out once when the reply is made.
+
+        ``info`` is None for an id the answer cites but no snippet backs.
+        """
+        plain = html.unescape(re.sub(r"<.*?>", "", text))
+        cited = self._extract_citation_numbers(plain)
+        refs = {cid: snippet_map[cid] for cid in cited if cid in snippet_map}
+        texts = self.snippet_store.get_many(info["key"] for info in refs.values())
+        out = []
+        for cid in cited:
+            info = refs.get(cid)
+            text = texts.get(info["key"]) if info else None
+            out.append({
+                "id": cid,
+                "info": None if text is None else {
+                    "source": info["source"],
+                    "page": info.get("page"),
+                    "preview": re.sub(r"\s+", " ", text).strip()[:120] + " …",
+                },
+            })
+        return out
+
     def _extract_citation_numbers(self, text: str) -> List[int]:
         return sorted({int(n) for n in self.cfg.INLINE_RE.findall(text)})
@@ -0,0 +1,125 @@
+"""SQLite-backed docstore: chunk text stays on disk until a hit needs it."""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id       TEXT PRIMARY KEY,
+    source   TEXT NOT NULL,
+    text     TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    pos INTEGER PRIMARY KEY,
+    id  TEXT NOT NULL
+);
+"""
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Drop-in for LangChain's ``InMemoryDocstore`` that never unpickles.
+
+    Opening is O(1): only ``positions`` (FAISS row → vector ID) is read
+    eagerly, by `load_positions`.  Text and metadata are fetched per hit.
+    Writes are held in one transaction until `commit`, so a crash mid-sync
+    leaves the last saved state intact next to the last saved FAISS file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------ #
+    # Docstore API                                                       #
+    # ------------------------------------------------------------------ #
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [
+            (doc_id, _source(doc), doc.page_content, json.dumps(doc.metadata, default=str))
+            for doc_id, doc in texts.items()
+        ]
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT INTO chunks (id, source, text, metadata) VALUES (?, ?, ?, ?)", rows
+                )
+            except sqlite3.IntegrityError as exc:
+                raise ValueError(f"Tried to add ids that already exist: {exc}") from exc
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            for batch in _chunks(list(ids), 500):
+                marks = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({marks})", batch)
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, metadata FROM chunks WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    # ------------------------------------------------------------------ #
+    # Extras                                                             #
+    # ------------------------------------------------------------------ #
+    def mget(self, ids: Iterable[str]) -> Dict[str, Document]:
+        """Batched `search`; missing ids are left out."""
+        out: Dict[str, Document] = {}
+        with self._lock:
+            for batch in _chunks(list(ids), 500):
+                marks = ",".join("?" * len(batch))
+                for doc_id, text, meta in self._conn.execute(
+                    f"SELECT id, text, metadata FROM chunks WHERE id IN ({marks})", batch
+                ):
+                    out[doc_id] = Document(page_content=text, metadata=json.loads(meta))
+        return out
+
+    def source_names(self) -> Dict[str, str]:
+        """{vector id: source file name} without reading any text."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT id, source FROM chunks"))
+
+    def load_positions(self) -> Dict[int, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT pos, id FROM positions"))
+
+    def save_positions(self, index_to_docstore_id: Dict[int, str]) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM positions")
+            self._conn.executemany(
+                "INSERT INTO positions (pos, id) VALUES (?, ?)",
+                ((int(p), i) for p, i in index_to_docstore_id.items()),
+            )
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+def _source(doc: Document) -> str:
+    return os.path.basename(doc.metadata.get("source") or doc.metadata.get("file_path", ""))
+
+
+def _chunks(items: list, size: int) -> Iterable[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
@@ -1,57 +1,170 @@
 """Handles document loading, indexing, and FAISS persistence."""
 from __future__ import annotations
+import hashlib
 import os
+import re
 import shutil
 import tempfile
-from typing import List, Tuple
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
 
+import faiss
 import streamlit as st
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.document_loaders import (
     Docx2txtLoader,
     UnstructuredWordDocumentLoader,
     UnstructuredPowerPointLoader,
     CSVLoader,
     TextLoader,
-    PyPDFLoader,
 )
 
 from config import AppConfig
+from science.chunk_store import SQLiteDocstore
+from science.embedding_cache import CachedEmbeddings, get_embedding_cache
+from science.embedding_scheduler import ScheduledEmbeddings, get_embedding_scheduler
+from science.index_factory import IndexSpec, fit_index, remove_documents, tune
+from science.index_jobs import IndexJob, get_job_registry
+from science.index_manifest import (
+    FileEntry,
+    IndexManifest,
+    ManifestDiff,
+    file_sha256,
+    vector_id_stem,
+)
+from science.index_registry import estimate_index_bytes, get_index_registry
+from science.lexical_index import LexicalIndex
+from science.ocr import ImageOCRLoader, OCRPDFLoader
+from science.parallel_loader import ParseResult, parse_files
+from science.retrieval import SourceIndex
+from science.tokens import count_tokens, token_windows
+
+# sentence-ish pieces: up to . ! ? followed by whitespace, a newline, or the end
+_PIECE_RE = re.compile(r".+?(?:[.!?](?=\s)|\n|\Z)", re.S)
+_WORD_RE = re.compile(r"\S+\s*")
+
+
+def _pieces(text: str, max_tokens: int, encoding: str) -> Iterator[Tuple[int, int, int]]:
+    """Yield (start, end, tokens) spans; over-long sentences fall back to words.
+
+    A "word" that is itself over-long (a URL, a base64 blob, OCR noise with
+    no spaces) is hard-split on token boundaries, so no piece, and hence no
+    chunk, exceeds ``max_tokens``.
+    """
+    for m in _PIECE_RE.finditer(text):
+        n = count_tokens(m.group(), encoding)
+        if n <= max_tokens:
+            yield m.start(), m.end(), n
+            continue
+        for w in _WORD_RE.finditer(m.group()):
+            word, base = w.group(), m.start() + w.start()
+            n = count_tokens(word, encoding)
+            if n <= max_tokens:
+                yield base, base + len(word), n
+                continue
+            for start, end in token_windows(word, max_tokens, encoding):
+                yield base + start, base + end, count_tokens(word[start:end], encoding)
+
+
+def _chunk_spans(
+    text: str, chunk_tokens: int, overlap: int, encoding: str
+) -> Iterator[Tuple[int, int]]:
+    """Greedily pack pieces into ≤ chunk_tokens windows sharing ~overlap tokens."""
+    window: deque = deque()
+    total, fresh = 0, False
+    for start, end, n in _pieces(text, chunk_tokens, encoding):
+        if fresh and total + n > chunk_tokens:
+            yield window[0][0], window[-1][1]
+            fresh = False
+            while window and (total > overlap or total + n > chunk_tokens):
+                total -= window.popleft()[2]  # the kept overlap must leave room for this piece
+        window.append((start, end, n))
+        total += n
+        fresh = True
+    if fresh:
+        yield window[0][0], window[-1][1]
+
+
+def chunk_documents(
+    docs: Iterable[Document],
+    chunk_tokens: int,
+    overlap: int,
+    encoding: str = "cl100k_base",
+) -> Iterator[Document]:
+    """Lazily split loader output into token-bounded passages.
+
+    Each chunk keeps the loader metadata (``source``, ``page``) plus
+    ``chunk`` (running index within its source) and the character span
+    ``start_index`` / ``end_index`` within the original page.
+    """
+    counters: dict = {}
+    for doc in docs:
+        src = doc.metadata.get("source", "")
+        for start, end in _chunk_spans(doc.page_content, chunk_tokens, overlap, encoding):
+            body = doc.page_content[start:end].strip()
+            if not body:
+                continue
+            n = counters.get(src, 0)
+            counters[src] = n + 1
+            yield Document(
+                page_content=body,
+                metadata={**doc.metadata, "chunk": n, "start_index": start, "end_index": end},
+            )
+
 
-@st.cache_resource(show_spinner=False)
-def load_and_index_defaults(folder: str, api_key: str) -> Tuple[List, FAISS | None]:
-    """Load every file in `folder`, build a FAISS index, and cache the result."""
-    from .document_manager import DocumentManager  # local import to avoid cycle
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
 
-    docs = []
-    if os.path.exists(folder):
-        for fname in os.listdir(folder):
-            loader_cls = DocumentManager.LOADER_MAP.get(fname.rsplit(".", 1)[-1].lower())
-            if loader_cls:
-                docs.extend(loader_cls(os.path.join(folder, fname)).load())
 
-    if not docs:
-        return [], None
+@dataclass
+class ClassIndex:
+    """Everything searchable for one class; cached and saved as a unit."""
+    name: str
+    vector_store: FAISS
+    lexical: LexicalIndex
+    _sources: SourceIndex | None = field(default=None, repr=False)
+
+    def nbytes(self) -> int:
+        return estimate_index_bytes(self.vector_store) + self.lexical.nbytes()
+
+    @property
+    def sources(self) -> SourceIndex:
+        """Source → vector-ID map, rebuilt lazily after the index changes."""
+        if self._sources is None:
+            self._sources = SourceIndex(self.vector_store)
+        return self._sources
 
-    embeddings = OpenAIEmbeddings(api_key=api_key)
-    return docs, FAISS.from_documents(docs, embeddings)
 
 class DocumentManager:
     """Responsible for all document I/O and vector store lifecycle."""
 
     LOADER_MAP = {
-        "pdf": PyPDFLoader,
+        "pdf": OCRPDFLoader,
         "docx": Docx2txtLoader,
         "doc": UnstructuredWordDocumentLoader,
         "pptx": UnstructuredPowerPointLoader,
         "csv": CSVLoader,
         "txt": TextLoader,
+        "png": ImageOCRLoader,
+        "jpg": ImageOCRLoader,
+        "jpeg": ImageOCRLoader,
+        "tif": ImageOCRLoader,
+        "tiff": ImageOCRLoader,
     }
+    CURRENT = "current"  # symlink in idx_dir → published version directory
+    SESSION_SHARD = "session"  # shard name of the per-session upload overlay
 
     def __init__(self, api_key: str, cfg: AppConfig):
         self.api_key = api_key
         self.cfg = cfg
+        self.parse_errors: List[Tuple[str, str]] = []  # (file, reason) from the last sync
 
     # ------------------------------------------------------------------ #
     # Public API                                                         #
@@ -68,63 +181,518 @@ class DocumentManager:
             if os.path.isdir(os.path.join(self.cfg.BASE_CTX_DIR, d))
         )
 
-    def ensure_vector_store(self, ctx_dir: str, idx_dir: str, uploaded_docs) -> FAISS:
-        """Return a FAISS index (loading or rebuilding as needed)."""
-        embeddings = OpenAIEmbeddings(api_key=self.api_key)
-        bin_path = os.path.join(idx_dir, f"{os.path.basename(idx_dir)}.faiss")
-        pkl_path = os.path.join(idx_dir, f"{os.path.basename(idx_dir)}.pkl")
+    def index_version(self, idx_dir: str) -> str | None:
+        """Published version of a class's index (a readlink, no reads)."""
+        try:
+            version = os.readlink(os.path.join(idx_dir, self.CURRENT))
+        except OSError:
+            return None
+        return version if os.path.isdir(os.path.join(idx_dir, version)) else None
 
-        def _exists() -> bool:
-            return os.path.isfile(bin_path) and os.path.isfile(pkl_path)
+    def invalidate_index(self, class_name: str) -> None:
+        """Forget any cached copy of this class's index (call after edits)."""
+        get_index_registry(self.cfg.INDEX_CACHE_MAX_MB).invalidate(class_name)
 
-        # Try fast path
-        if _exists():
-            try:
-                return FAISS.load_local(idx_dir, embeddings, allow_dangerous_deserialization=True)
-            except Exception:
-                shutil.rmtree(idx_dir, ignore_errors=True)  # force rebuild if corrupted
+    def drop_index(self, class_name: str, idx_dir: str) -> None:
+        """Delete a class's index on disk, waiting for any build of it to finish."""
+        registry = get_index_registry(self.cfg.INDEX_CACHE_MAX_MB)
+        with registry.build_lock(class_name):
+            registry.invalidate(class_name)
+            shutil.rmtree(idx_dir, ignore_errors=True)
+
+    def registry_stats(self) -> dict:
+        return get_index_registry(self.cfg.INDEX_CACHE_MAX_MB).snapshot()
+
+    def index_spec(self, class_name: str) -> IndexSpec:
+        """FAISS family + knobs for a class (AppConfig.INDEX_TYPES overrides INDEX_TYPE)."""
+        return IndexSpec(
+            kind=self.cfg.INDEX_TYPES.get(class_name, self.cfg.INDEX_TYPE),
+            hnsw_m=self.cfg.HNSW_M,
+            hnsw_ef_search=self.cfg.HNSW_EF_SEARCH,
+            ivf_nlist=self.cfg.IVF_NLIST,
+            ivf_nprobe=self.cfg.IVF_NPROBE,
+            pq_m=self.cfg.PQ_M,
+            min_train=self.cfg.INDEX_MIN_TRAIN,
+        )
+
+    def embeddings(self) -> CachedEmbeddings:
+        """Scheduled OpenAI embeddings behind the persistent content-addressed cache."""
+        return CachedEmbeddings(
+            ScheduledEmbeddings(self._embedding_scheduler()), self._embedding_cache()
+        )
 
-        # Build from scratch
-        default_docs, default_idx = load_and_index_defaults(ctx_dir, self.api_key)
-        session_docs = self._load_uploaded_files(uploaded_docs)
+    def embedding_cache_stats(self) -> dict:
+        return self._embedding_cache().snapshot()
 
-        if default_idx and session_docs:
-            vector_store = FAISS.from_documents(
-                default_docs + session_docs, embeddings
+    def embedding_scheduler_stats(self) -> dict:
+        return self._embedding_scheduler().snapshot()
+
+    def shard_loaders(self) -> Dict[str, Callable[[], ClassIndex]]:
+        """Openers for every class with a saved, current index (no syncing).
+
+        Everything Streamlit-bound is resolved here, so the returned
+        callables are safe to run on worker threads.
+        """
+        registry = get_index_registry(self.cfg.INDEX_CACHE_MAX_MB)
+        embeddings = self.embeddings()
+        loaders = {}
+        for class_name in self.list_class_folders():
+            _, idx_dir = self.get_active_class_dirs(class_name)
+            version = self.index_version(idx_dir)
+            if version is None:
+                continue
+            version_dir = os.path.join(idx_dir, version)
+            manifest = IndexManifest.load(version_dir, self._build_signature(class_name))
+            if manifest is None or self._manifest_only(version_dir, manifest):
+                continue
+            loaders[class_name] = partial(
+                registry.get_or_load,
+                class_name,
+                version,
+                partial(self._load_class_index, class_name, version_dir, embeddings),
+                sizeof=ClassIndex.nbytes,
             )
-        elif default_idx:
-            vector_store = default_idx
-        elif session_docs:
-            vector_store = FAISS.from_documents(session_docs, embeddings)
-        else:
+        return loaders
+
+    def ensure_vector_store(self, ctx_dir: str, idx_dir: str) -> FAISS:
+        """Return the class's FAISS store (see `ensure_class_index`)."""
+        index = self.ensure_class_index(ctx_dir, idx_dir)
+        if index is None:  # only reachable outside a Streamlit run, where st.stop() returns
+            raise RuntimeError(f"no index could be built from {ctx_dir}")
+        return index.vector_store
+
+    def ensure_class_index(
+        self, ctx_dir: str, idx_dir: str, background: bool = False, retry: bool = False
+    ) -> ClassIndex | None:
+        """Return the class's dense + lexical indexes, synced with `ctx_dir`.
+
+        The manifest records which vector IDs each file produced, so an
+        added, edited or deleted file only embeds / removes its own vectors.
+
+        Builds are single-flight and copy-on-write: one build per class
+        copies the current version into a new ``idx_dir/v…`` directory,
+        updates that copy, and publishes it by atomically re-pointing the
+        ``current`` symlink.  Meanwhile other sessions keep serving the
+        version they have, and only wait when there is none yet.
+
+        With ``background=True`` the sync is queued as an `IndexJob` and the
+        published version is returned straight away (None if there is none
+        yet); `index_job` reports its progress.  A sync that already ran on
+        the same published version and file changes isn't queued again
+        (so a failing one isn't retried on every rerun) unless ``retry``.
+        """
+        embeddings = self.embeddings()
+        registry = get_index_registry(self.cfg.INDEX_CACHE_MAX_MB)
+        class_name = os.path.basename(ctx_dir)
+        signature = self._build_signature(class_name)
+
+        # Fast path: published version (process-wide cache, then disk)
+        version, index, manifest = self._open_current(
+            registry, class_name, idx_dir, signature, embeddings
+        )
+        changes = manifest.diff(ctx_dir, self.LOADER_MAP)
+        if index is not None and not changes:
+            return index
+
+        sync = partial(self._sync, registry, class_name, ctx_dir, idx_dir, embeddings)
+        if background:
+            if changes:
+                key = (version, self._changes_key(ctx_dir, changes))
+                self._job_registry().submit(class_name, sync, key=key, retry=retry)
+            return index
+        if index is not None and registry.build_lock(class_name).locked():
+            return index  # another build of this class is running: serve what we have
+
+        job = IndexJob(class_name)
+        index = sync(job)
+        self.parse_errors = job.errors
+        for name, reason in job.errors:
+            st.warning(f"⚠️ Skipped {name}: {reason}")
+        if index is None or index.vector_store.index.ntotal == 0:
             st.error("⚠️ This class has no documents yet. Upload something first.")
             st.stop()
+        return index
+
+    def session_overlay(self, uploaded_docs, ctx_dir: str) -> ClassIndex | None:
+        """Index of this session's unsaved uploads, searched beside the class's.
+
+        Built once per set of uploads and kept in ``st.session_state`` only,
+        so it goes away with the session; the shared index never sees it.
+        Uploads already saved to ``ctx_dir`` unchanged are left to the class
+        index, so their passages aren't retrieved twice.
+        """
+        uploads = [
+            f for f in uploaded_docs or []
+            if f.name.rsplit(".", 1)[-1].lower() in self.LOADER_MAP
+            and not self._is_saved(f, ctx_dir)
+        ]
+        key = tuple(sorted((f.name, f.size, getattr(f, "file_id", "")) for f in uploads))
+        cached = st.session_state.get("upload_overlay")
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        overlay = self._build_overlay(uploads) if uploads else None
+        st.session_state.upload_overlay = (key, overlay)
+        return overlay
 
-        vector_store.save_local(idx_dir)
-        return vector_store
+    def index_job(self, class_name: str) -> IndexJob | None:
+        """Latest background sync of a class (running or finished), if any."""
+        return self._job_registry().latest(class_name)
 
     # ------------------------------------------------------------------ #
     # Internal helpers                                                   #
     # ------------------------------------------------------------------ #
-    def _pick_loader(self, path: str):
-        ext = os.path.splitext(path)[1].lower().lstrip(".")
-        loader_cls = self.LOADER_MAP.get(ext)
-        return loader_cls(path) if loader_cls else None
-
-    def _load_uploaded_files(self, uploaded_files) -> List:
-        if not uploaded_files:
-            return []
-        tmp = tempfile.mkdtemp()
-        docs = []
-        for f in uploaded_files:
-            ext = f.name.rsplit(".", 1)[-1].lower()
-            if ext not in self.LOADER_MAP:
+    def _open_current(
+        self, registry, class_name: str, idx_dir: str, signature: str, embeddings
+    ) -> Tuple[str | None, ClassIndex | None, IndexManifest]:
+        """(version, index, manifest) of the published version, if usable.
+
+        An unreadable or outdated version yields no index and an empty
+        manifest, i.e. a fresh build.  A manifest-only version (every file
+        failed to parse) yields no index but keeps its manifest, so those
+        files aren't retried until they change.
+        """
+        version = self.index_version(idx_dir)
+        if version is None:
+            return None, None, IndexManifest(signature)
+        version_dir = os.path.join(idx_dir, version)
+        manifest = IndexManifest.load(version_dir, signature)
+        if manifest is None:
+            return version, None, IndexManifest(signature)
+        if self._manifest_only(version_dir, manifest):
+            return version, None, manifest
+        try:
+            index = registry.get_or_load(
+                class_name,
+                version,
+                lambda: self._load_class_index(class_name, version_dir, embeddings),
+                sizeof=ClassIndex.nbytes,
+            )
+        except Exception:
+            registry.invalidate(class_name)  # corrupted: rebuild from scratch
+            return version, None, IndexManifest(signature)
+        return version, index, manifest
+
+    def _sync(
+        self,
+        registry,
+        class_name: str,
+        ctx_dir: str,
+        idx_dir: str,
+        embeddings,
+        job: IndexJob,
+    ) -> ClassIndex | None:
+        """Bring the published version up to date under the class's build lock.
+
+        Makes no Streamlit calls, so it also runs on job-queue threads.
+        """
+        signature = self._build_signature(class_name)
+        with registry.build_lock(class_name):
+            # a build we waited for may already cover the changes
+            version, index, manifest = self._open_current(
+                registry, class_name, idx_dir, signature, embeddings
+            )
+            changes = manifest.diff(ctx_dir, self.LOADER_MAP)
+            if not changes:
+                return index  # up to date, or nothing to build (e.g. class deleted meanwhile)
+            job.begin(len(changes.added) + len(changes.changed))
+            return self._build_version(
+                registry, class_name, idx_dir, version if index is not None else None,
+                manifest, changes, ctx_dir, embeddings, job,
+            )
+
+    def _build_version(
+        self,
+        registry,
+        class_name: str,
+        idx_dir: str,
+        base: str | None,
+        manifest: IndexManifest,
+        changes: ManifestDiff,
+        ctx_dir: str,
+        embeddings,
+        job: IndexJob,
+    ) -> ClassIndex | None:
+        """Write a new version (from a copy of ``base``, if any) and publish it.
+
+        The served index is never mutated: the copy is opened as a separate
+        ClassIndex, so sessions holding the old one are unaffected.
+        """
+        version = f"v{time.time_ns()}"
+        version_dir = os.path.join(idx_dir, version)
+        if base is not None:
+            shutil.copytree(os.path.join(idx_dir, base), version_dir)
+            index = self._load_class_index(class_name, version_dir, embeddings)
+        else:
+            os.makedirs(version_dir)
+            index = None
+        try:
+            index = self._apply_changes(
+                index, class_name, manifest, changes, ctx_dir, version_dir, embeddings, job
+            )
+            if index is None:
+                # nothing parsed: publish the manifest alone so the failed
+                # files are remembered instead of re-parsed on every rerun
+                manifest.save(version_dir)
+            else:
+                self._save_class_index(index, manifest, version_dir)
+        except BaseException:
+            shutil.rmtree(version_dir, ignore_errors=True)  # never publish a half-built version
+            raise
+
+        self._publish(idx_dir, version)
+        if index is not None:
+            registry.put(class_name, version, index, sizeof=ClassIndex.nbytes)
+        self._collect_versions(idx_dir, keep={version, base})
+        return index
+
+    def _publish(self, idx_dir: str, version: str) -> None:
+        """Atomically point ``idx_dir/current`` at ``version``."""
+        link = os.path.join(idx_dir, self.CURRENT)
+        tmp = f"{link}.{version}.tmp"
+        os.symlink(version, tmp)
+        os.replace(tmp, link)
+
+    def _collect_versions(self, idx_dir: str, keep: set) -> None:
+        """Remove superseded versions (and pre-versioning files).
+
+        The previous version is kept one more round: sessions may still be
+        reading it.  POSIX lets open files outlive their unlink anyway.
+        """
+        for entry in os.listdir(idx_dir):
+            if entry == self.CURRENT or entry in keep:
+                continue
+            path = os.path.join(idx_dir, entry)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    def _load_class_index(self, class_name: str, idx_dir: str, embeddings) -> ClassIndex:
+        """Open a saved index: FAISS file + SQLite chunk store, no pickle."""
+        faiss_path, db_path = self._index_paths(idx_dir)
+        docstore = SQLiteDocstore(db_path)
+        vector_store = FAISS(
+            embeddings, faiss.read_index(faiss_path), docstore, docstore.load_positions()
+        )
+        tune(vector_store.index, self.index_spec(class_name))  # search knobs aren't saved
+        lexical = LexicalIndex.load(idx_dir) or LexicalIndex.from_docstore(
+            vector_store.index_to_docstore_id, vector_store.docstore
+        )
+        return ClassIndex(class_name, vector_store, lexical)
+
+    def _save_class_index(self, index: ClassIndex, manifest: IndexManifest, idx_dir: str) -> None:
+        faiss_path, _ = self._index_paths(idx_dir)
+        store = index.vector_store
+        faiss.write_index(store.index, f"{faiss_path}.tmp")
+        os.replace(f"{faiss_path}.tmp", faiss_path)
+        store.docstore.save_positions(store.index_to_docstore_id)
+        store.docstore.commit()
+        index.lexical.save(idx_dir)
+        manifest.save(idx_dir)
+
+    def _apply_changes(
+        self,
+        index: ClassIndex | None,
+        class_name: str,
+        manifest: IndexManifest,
+        changes: ManifestDiff,
+        ctx_dir: str,
+        version_dir: str,
+        embeddings,
+        job: IndexJob,
+    ) -> ClassIndex | None:
+        """Delete vectors of removed/changed files, embed added/changed ones.
+
+        New stores are built flat and converted to the class's index family
+        (training it if needed) once all vectors are in; see `fit_index`.
+        """
+        manifest.entries.update(changes.touched)
+        spec = self.index_spec(class_name)
+
+        if index is not None:
+            live = set(index.vector_store.index_to_docstore_id.values())
+            stale = [i for i in manifest.ids_for(changes.removed + changes.changed) if i in live]
+            if stale:
+                remove_documents(index.vector_store, stale, spec, embeddings)
+                index.lexical.remove(stale)
+        for name in changes.removed:
+            manifest.entries.pop(name, None)
+
+        pending = self._pending_chunks(manifest, changes, ctx_dir, job)
+        for batch in _batched(pending, self.cfg.INDEX_ADD_BATCH):
+            texts = [d.page_content for d, _ in batch]
+            ids = [i for _, i in batch]
+            vectors = embeddings.embed_documents(texts)
+            if index is None:
+                store = FAISS(
+                    embeddings, faiss.IndexFlatL2(len(vectors[0])), self._new_docstore(version_dir), {}
+                )
+                index = ClassIndex(class_name, store, LexicalIndex())
+            index.vector_store.add_embeddings(
+                zip(texts, vectors), metadatas=[d.metadata for d, _ in batch], ids=ids
+            )
+            index.lexical.add(ids, texts)
+            job.chunks_indexed(len(batch))
+        if index is not None:
+            fit_index(index.vector_store, spec, embeddings)
+            index._sources = None  # positions shifted
+        return index
+
+    def _pending_chunks(
+        self,
+        manifest: IndexManifest,
+        changes: ManifestDiff,
+        ctx_dir: str,
+        job: IndexJob,
+    ) -> Iterator[Tuple[Document, str]]:
+        """Stream (chunk, vector id) pairs, recording ids in the manifest.
+
+        Files are parsed on the process pool; a file that fails is recorded
+        with no vectors (so it isn't retried until it changes) and reported.
+        """
+        names = changes.added + changes.changed
+        paths = [os.path.join(ctx_dir, n) for n in names]
+        for name, result in zip(names, self._parse(paths)):
+            sha = result.sha256 or file_sha256(result.path)
+            info = os.stat(result.path)
+            entry = FileEntry(info.st_size, info.st_mtime_ns, sha, [])
+            manifest.entries[name] = entry
+            job.file_parsed(name, result.error)
+            if result.error:
                 continue
-            fp = os.path.join(tmp, f.name)
-            with open(fp, "wb") as out:
-                out.write(f.getbuffer())
-            loader = self.LOADER_MAP[ext](fp)
-            docs.extend(loader.load())
-        return docs
+            stem = vector_id_stem(name, sha)
+            for n, chunk in enumerate(result.docs):
+                entry.ids.append(f"{stem}:{n}")
+                yield chunk, entry.ids[-1]
+
+    def _parse(self, paths: List[str], persist: bool = True) -> Iterator[ParseResult]:
+        """Parse + chunk; ``persist=False`` leaves nothing in the parse or OCR caches."""
+        return parse_files(
+            paths,
+            (self.cfg.CHUNK_TOKENS, self.cfg.CHUNK_OVERLAP, self.cfg.TOKEN_ENCODING),
+            workers=self.cfg.PARSE_WORKERS,
+            timeout=self.cfg.PARSE_TIMEOUT_S,
+            cache=(self.cfg.PARSE_CACHE_PATH, self.cfg.PARSE_CACHE_MAX_MB * 2**20),
+            persist=persist,
+        )
 
+    def _build_signature(self, class_name: str) -> str:
+        return (
+            f"chunk={self.cfg.CHUNK_TOKENS}/{self.cfg.CHUNK_OVERLAP}"
+            f";embed={self.cfg.EMBEDDING_MODEL}"
+            f";index={self.index_spec(class_name).tag()}"
+            f";ocr={self.cfg.OCR_LANG}"
+            f";store=sqlite"
+        )
+
+    def _embedding_scheduler(self):
+        return get_embedding_scheduler(
+            self.api_key,
+            self.cfg.EMBEDDING_MODEL,
+            self.cfg.EMBED_API_BASE,
+            self.cfg.EMBED_BATCH_TOKENS,
+            self.cfg.EMBED_CONCURRENCY,
+        )
+
+    def _embedding_cache(self):
+        return get_embedding_cache(
+            self.cfg.EMBED_CACHE_DIR, self.cfg.EMBEDDING_MODEL, self.cfg.EMBED_CACHE_MAX_MB
+        )
+
+    def _job_registry(self):
+        return get_job_registry(self.cfg.INDEX_JOB_WORKERS)
+
+    @staticmethod
+    def _changes_key(ctx_dir: str, changes: ManifestDiff) -> Tuple:
+        """Identifies pending changes, including the current size/mtime of each file."""
+        stats = []
+        for name in sorted(changes.added + changes.changed + list(changes.touched)):
+            try:
+                info = os.stat(os.path.join(ctx_dir, name))
+                stats.append((name, info.st_size, info.st_mtime_ns))
+            except OSError:
+                stats.append((name, None, None))
+        return tuple(stats), tuple(sorted(changes.removed))
 
+    def _manifest_only(self, version_dir: str, manifest: IndexManifest) -> bool:
+        """A version with no vectors at all, as `_build_version` writes when nothing parsed."""
+        faiss_path, _ = self._index_paths(version_dir)
+        return not os.path.exists(faiss_path) and not any(e.ids for e in manifest.entries.values())
+
+    def _index_paths(self, version_dir: str) -> Tuple[str, str]:
+        return (
+            os.path.join(version_dir, "index.faiss"),
+            os.path.join(version_dir, "chunks.sqlite"),
+        )
+
+    def _new_docstore(self, version_dir: str) -> SQLiteDocstore:
+        """Empty chunk store for a fresh build."""
+        _, db_path = self._index_paths(version_dir)
+        return SQLiteDocstore(db_path)
+
+    @staticmethod
+    def _is_saved(upload, ctx_dir: str) -> bool:
+        """Whether ``upload`` sits unchanged in ``ctx_dir``: size first, then sha256.
+
+        Hashes are memoized in the session (uploads by ``file_id``, saved
+        files by size + mtime), so a rerun re-reads neither.
+        """
+        path = os.path.join(ctx_dir, upload.name)
+        try:
+            info = os.stat(path)
+        except OSError:
+            return False
+        if info.st_size != upload.size:
+            return False
+        hashes = st.session_state.setdefault("upload_hashes", {})
+        upload_key = ("upload", getattr(upload, "file_id", None) or upload.name, upload.size)
+        if upload_key not in hashes:
+            hashes[upload_key] = hashlib.sha256(upload.getvalue()).hexdigest()
+        saved_key = ("saved", path, info.st_size, info.st_mtime_ns)
+        if saved_key not in hashes:
+            try:
+                hashes[saved_key] = file_sha256(path)
+            except OSError:
+                return False
+        return hashes[upload_key] == hashes[saved_key]
+
+    def _build_overlay(self, uploaded_files) -> ClassIndex | None:
+        """Parse + embed session uploads into a small in-memory flat index.
+
+        Nothing derived from the uploads is written to disk: parsing skips
+        the parse and OCR caches, and embedding skips the embedding cache.
+        """
+        tmp = tempfile.mkdtemp()
+        try:
+            paths = []
+            for f in uploaded_files:
+                fp = os.path.join(tmp, f.name)
+                with open(fp, "wb") as out:
+                    out.write(f.getbuffer())
+                paths.append(fp)
+            chunks = []
+            for result in self._parse(paths, persist=False):
+                if result.error:
+                    st.warning(f"⚠️ Skipped {os.path.basename(result.path)}: {result.error}")
+                chunks.extend(result.docs)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        # content-addressed ids: identical passages share one snippet-store entry
+        unique = {}
+        for d in chunks:
+            unique.setdefault(f"upload:{hashlib.sha1(d.page_content.encode()).hexdigest()[:16]}", d)
+        if not unique:
+            return None
+        embeddings = ScheduledEmbeddings(self._embedding_scheduler())  # no on-disk cache
+        ids = list(unique)
+        chunks = list(unique.values())
+        texts = [d.page_content for d in chunks]
+        store = FAISS.from_embeddings(
+            zip(texts, embeddings.embed_documents(texts)),
+            embeddings,
+            metadatas=[d.metadata for d in chunks],
+            ids=ids,
+        )
+        lexical = LexicalIndex()
+        lexical.add(ids, texts)
+        return ClassIndex(self.SESSION_SHARD, store, lexical)
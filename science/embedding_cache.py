@@ -0,0 +1,247 @@
+"""Content-addressed on-disk embedding cache in front of any LangChain embedder."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+import streamlit as st
+from langchain_core.embeddings import Embeddings
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    query_hits: int = 0
+    query_misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def text_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Vectors for one model stored as a float32 matrix plus a row index.
+
+    ``vectors.f32`` is an append-only row-major matrix read through
+    ``np.memmap``; ``index.json`` maps text keys to ``[row, last_used]``.
+    New rows go to ``index.jsonl``, a journal replayed on open, and are
+    folded into ``index.json`` once the journal rivals it in size, so a
+    batch costs O(batch), not O(cache).  When the matrix grows past
+    ``max_bytes`` the least recently used rows are dropped and the file is
+    compacted.
+
+    Query vectors are kept separately in a small in-memory LRU: they are
+    short-lived and repeat within a turn or across sessions.
+    """
+
+    JOURNAL_MIN_ROWS = 4096  # never fold a journal shorter than this
+
+    def __init__(self, root: str, model: str, max_bytes: int, query_slots: int = 1024):
+        self.model = model
+        self.max_bytes = max_bytes
+        self.query_slots = query_slots
+        self._queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self._vec_path = os.path.join(self.dir, "vectors.f32")
+        self._idx_path = os.path.join(self.dir, "index.json")
+        self._journal_path = os.path.join(self.dir, "index.jsonl")
+        self._dim, self._tick, self._rows, self._journal_rows = self._read_index()
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                         #
+    # ------------------------------------------------------------------ #
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        with self._lock:
+            found = {k: self._rows[k] for k in keys if k in self._rows}
+            self.stats.hits += len(found)
+            self.stats.misses += len(keys) - len(found)
+            if not found:
+                return {}
+            matrix = self._matrix()
+            self._tick += 1
+            out = {}
+            for k, entry in found.items():
+                entry[1] = self._tick
+                out[k] = matrix[entry[0]].tolist()
+            return out
+
+    def put_many(self, vectors: Dict[str, Sequence[float]]) -> None:
+        with self._lock:
+            new = {k: v for k, v in vectors.items() if k not in self._rows}
+            if not new:
+                return
+            block = np.asarray(list(new.values()), dtype=np.float32)
+            first = self._dim is None
+            if first:
+                self._dim = block.shape[1]
+            start = len(self._rows)
+            with open(self._vec_path, "ab") as f:
+                f.write(block.tobytes())
+            self._tick += 1
+            for offset, key in enumerate(new):
+                self._rows[key] = [start + offset, self._tick]
+            if len(self._rows) * self._dim * 4 > self.max_bytes:
+                self._compact()
+                self._write_index()
+            elif first or self._journal_rows + len(new) >= max(
+                self.JOURNAL_MIN_ROWS, len(self._rows) // 2
+            ):
+                self._write_index()
+            else:
+                self._append_journal(new)
+
+    def get_query(self, key: str) -> List[float] | None:
+        with self._lock:
+            vec = self._queries.get(key)
+            if vec is None:
+                self.stats.query_misses += 1
+                return None
+            self._queries.move_to_end(key)
+            self.stats.query_hits += 1
+            return vec
+
+    def put_query(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._queries[key] = vector
+            self._queries.move_to_end(key)
+            while len(self._queries) > self.query_slots:
+                self._queries.popitem(last=False)
+
+    def snapshot(self) -> Dict:
+        size = len(self._rows) * (self._dim or 0) * 4
+        return {
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "hit_rate": round(self.stats.hit_rate, 3),
+            "evictions": self.stats.evictions,
+            "query_hits": self.stats.query_hits,
+            "query_misses": self.stats.query_misses,
+            "entries": len(self._rows),
+            "size_mb": round(size / 2**20, 1),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Internal helpers                                                   #
+    # ------------------------------------------------------------------ #
+    def _matrix(self) -> np.ndarray:
+        return np.memmap(
+            self._vec_path, dtype=np.float32, mode="r", shape=(len(self._rows), self._dim)
+        )
+
+    def _compact(self) -> None:
+        """Keep the most recently used rows (down to 80 % of the cap)."""
+        keep_n = int(self.max_bytes * 0.8) // (self._dim * 4)
+        ranked = sorted(self._rows.items(), key=lambda kv: kv[1][1], reverse=True)
+        keep = sorted(ranked[:keep_n], key=lambda kv: kv[1][0])
+        matrix = self._matrix()
+        tmp = f"{self._vec_path}.tmp"
+        with open(tmp, "wb") as f:
+            for _key, (row, _tick) in keep:
+                f.write(np.asarray(matrix[row]).tobytes())
+        del matrix
+        os.replace(tmp, self._vec_path)
+        self.stats.evictions += len(self._rows) - len(keep)
+        self._rows = {k: [i, tick] for i, (k, (_, tick)) in enumerate(keep)}
+
+    def _read_index(self):
+        try:
+            with open(self._idx_path, encoding="utf-8") as f:
+                raw = json.load(f)
+            dim, tick, rows = raw["dim"], raw["tick"], raw["rows"]
+            journal_rows = 0
+            if os.path.exists(self._journal_path):
+                good = 0
+                with open(self._journal_path, "rb") as f:
+                    for line in f:
+                        try:
+                            if not line.endswith(b"\n"):
+                                raise ValueError("torn line")
+                            key, row, used = json.loads(line)
+                        except ValueError:
+                            break  # torn last line: its vectors are cut off below
+                        rows[key] = [row, used]
+                        tick = max(tick, used)
+                        journal_rows += 1
+                        good += len(line)
+                os.truncate(self._journal_path, good)  # so later appends start on a fresh line
+            expected = len(rows) * dim * 4
+            size = os.path.getsize(self._vec_path)
+            if size < expected:
+                raise ValueError("vector file and index disagree")
+            if size > expected:  # rows appended but never journaled
+                os.truncate(self._vec_path, expected)
+            return dim, tick, rows, journal_rows
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            # missing or torn cache: start empty rather than serve bad vectors
+            for path in (self._vec_path, self._journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return None, 0, {}, 0
+
+    def _append_journal(self, keys) -> None:
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            f.writelines(f"{json.dumps([k, *self._rows[k]])}\n" for k in keys)
+        self._journal_rows += len(keys)
+
+    def _write_index(self) -> None:
+        """Snapshot every row (and its last use) into ``index.json``; empty the journal."""
+        tmp = f"{self._idx_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self._dim, "tick": self._tick, "rows": self._rows}, f)
+        os.replace(tmp, self._idx_path)
+        open(self._journal_path, "w").close()  # a crash before this just replays rows already in the snapshot
+        self._journal_rows = 0
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends never-seen text to ``inner``."""
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(self.cache.model, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found:
+                missing.setdefault(k, t)
+        if missing:
+            fresh = self.inner.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, fresh))
+            self.cache.put_many(computed)
+            found.update(computed)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(self.cache.model, text)
+        vec = self.cache.get_query(key)
+        if vec is None:
+            vec = self.inner.embed_query(text)
+            self.cache.put_query(key, vec)
+        return vec
+
+
+@st.cache_resource(show_spinner=False)
+def get_embedding_cache(root: str, model: str, max_mb: int) -> EmbeddingCache:
+    """One cache per (directory, model) per server process."""
+    return EmbeddingCache(root, model, max_bytes=max_mb * 2**20)
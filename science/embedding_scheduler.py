@@ -0,0 +1,244 @@
+"""Token-bounded, concurrent embedding batches with adaptive 429 back-off."""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Sequence
+
+import streamlit as st
+from langchain_core.embeddings import Embeddings
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI
+
+from science.tokens import count_tokens
+
+BatchEmbedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+@dataclass
+class SchedulerStats:
+    batches: int = 0
+    texts: int = 0
+    tokens: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    busy_seconds: float = 0.0  # wall time with at least one request running
+
+    @property
+    def texts_per_s(self) -> float:
+        return self.texts / self.busy_seconds if self.busy_seconds else 0.0
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.tokens / self.busy_seconds if self.busy_seconds else 0.0
+
+
+def _is_rate_limit(exc: Exception) -> bool:
+    return getattr(exc, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def _is_transient(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    return isinstance(exc, (APIConnectionError, APITimeoutError, asyncio.TimeoutError)) or (
+        status is not None and status >= 500
+    )
+
+
+def _retry_after(exc: Exception) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _AdaptiveLimit:
+    """Concurrency gate: halves on 429, creeps back up by one per success."""
+
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.limit = maximum
+        self.active = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    async def throttle(self) -> None:
+        async with self._cond:
+            self.limit = max(1, self.limit // 2)
+
+    async def recover(self) -> None:
+        async with self._cond:
+            if self.limit < self.maximum:
+                self.limit += 1
+                self._cond.notify_all()
+
+
+class EmbeddingScheduler:
+    """Packs texts into token-bounded batches and embeds them concurrently.
+
+    Runs its own event loop on a daemon thread so synchronous callers (the
+    Streamlit script thread, worker threads) can share one rate-limit state.
+    ``embed_batch`` is any async ``texts -> vectors`` callable, which keeps
+    the scheduler testable against a fake client or a local stand-in server.
+    """
+
+    def __init__(
+        self,
+        embed_batch: BatchEmbedder,
+        max_batch_tokens: int = 32_000,
+        max_batch_items: int = 512,
+        concurrency: int = 4,
+        max_retries: int = 6,
+        encoding: str = "cl100k_base",
+    ):
+        self.embed_batch = embed_batch
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.max_retries = max_retries
+        self.encoding = encoding
+        self.stats = SchedulerStats()
+        self._concurrency = concurrency
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True,
+                         name="embedding-scheduler").start()
+        self._limit = asyncio.run_coroutine_threadsafe(self._make_limit(), self._loop).result()
+        self._running = 0
+        self._busy_since = 0.0
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                         #
+    # ------------------------------------------------------------------ #
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Blocking wrapper; safe to call from any thread."""
+        if not texts:
+            return []
+        return asyncio.run_coroutine_threadsafe(self.aembed(texts), self._loop).result()
+
+    async def aembed(self, texts: Sequence[str]) -> List[List[float]]:
+        batches = self.pack(texts)
+        vectors = await asyncio.gather(*(self._run_batch([texts[i] for i in b]) for b in batches))
+        out: List[List[float]] = [None] * len(texts)  # type: ignore[list-item]
+        for batch, vecs in zip(batches, vectors):
+            for i, v in zip(batch, vecs):
+                out[i] = v
+        return out
+
+    def pack(self, texts: Sequence[str]) -> List[List[int]]:
+        """Greedy first-fit of text indices into token/item-bounded batches."""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        used = 0
+        for i, text in enumerate(texts):
+            n = count_tokens(text, self.encoding)
+            if current and (used + n > self.max_batch_tokens
+                            or len(current) >= self.max_batch_items):
+                batches.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += n
+        if current:
+            batches.append(current)
+        return batches
+
+    def snapshot(self) -> Dict:
+        return {
+            "batches": self.stats.batches,
+            "texts": self.stats.texts,
+            "retries": self.stats.retries,
+            "rate_limited": self.stats.rate_limited,
+            "concurrency": self._limit.limit,
+            "texts_per_s": round(self.stats.texts_per_s, 1),
+            "tokens_per_s": round(self.stats.tokens_per_s),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Internal helpers                                                   #
+    # ------------------------------------------------------------------ #
+    async def _make_limit(self) -> _AdaptiveLimit:
+        return _AdaptiveLimit(self._concurrency)
+
+    async def _run_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            async with self._limit:
+                self._mark_busy(+1)
+                try:
+                    vectors = await self.embed_batch(texts)
+                except Exception as exc:
+                    error = exc
+                else:
+                    self.stats.batches += 1
+                    self.stats.texts += len(texts)
+                    self.stats.tokens += sum(count_tokens(t, self.encoding) for t in texts)
+                    await self._limit.recover()
+                    return vectors
+                finally:
+                    self._mark_busy(-1)
+
+            if attempt == self.max_retries or not (_is_rate_limit(error) or _is_transient(error)):
+                raise error
+            self.stats.retries += 1
+            delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+            if _is_rate_limit(error):
+                self.stats.rate_limited += 1
+                await self._limit.throttle()
+                delay = _retry_after(error) or delay
+            await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def _mark_busy(self, delta: int) -> None:
+        now = time.perf_counter()
+        if self._running:
+            self.stats.busy_seconds += now - self._busy_since
+        self._busy_since = now
+        self._running += delta
+
+
+class ScheduledEmbeddings(Embeddings):
+    """LangChain ``Embeddings`` facade over an EmbeddingScheduler."""
+
+    def __init__(self, scheduler: EmbeddingScheduler):
+        self.scheduler = scheduler
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.scheduler.embed([text])[0]
+
+
+def openai_batch_embedder(api_key: str, model: str, base_url: str | None = None) -> BatchEmbedder:
+    """Async OpenAI embeddings call with client-side retries disabled."""
+    client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+    async def embed(texts: List[str]) -> List[List[float]]:
+        resp = await client.embeddings.create(model=model, input=texts)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    return embed
+
+
+@st.cache_resource(show_spinner=False)
+def get_embedding_scheduler(
+    api_key: str,
+    model: str,
+    base_url: str | None,
+    max_batch_tokens: int,
+    concurrency: int,
+) -> EmbeddingScheduler:
+    """One scheduler (and one 429 back-off state) per server process."""
+    return EmbeddingScheduler(
+        openai_batch_embedder(api_key, model, base_url),
+        max_batch_tokens=max_batch_tokens,
+        concurrency=concurrency,
+    )
@@ -0,0 +1,292 @@
+"""Per-class FAISS index families: build, train, tune and maintain.
+
+LangChain's FAISS wrapper always builds an exact ``IndexFlatL2``.  Classes
+can instead pick HNSW, IVF-Flat, IVF-PQ or SQ8; the store is built flat
+and then converted (and trained) once all its vectors are known.
+Positions are preserved, so ``index_to_docstore_id`` stays valid.
+"""
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Sequence
+
+import faiss
+import numpy as np
+
+FAMILIES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8")
+_TRAINED = ("ivf_flat", "ivf_pq")
+_LOSSLESS = ("flat", "hnsw", "ivf_flat")  # stored vectors reconstruct exactly
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """Index family plus its build/search knobs (0 = pick from the data)."""
+    kind: str = "flat"
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 80
+    hnsw_ef_search: int = 64
+    ivf_nlist: int = 0  # 0 → ~4·√n, capped so each list gets ≥ 39 training points
+    ivf_nprobe: int = 16
+    pq_m: int = 0  # 0 → d/16 sub-quantizers (rounded to a divisor of d)
+    pq_bits: int = 8
+    min_train: int = 2_000  # trained families stay flat until a class has this many vectors
+
+    def __post_init__(self):
+        if self.kind not in FAMILIES:
+            raise ValueError(f"unknown index family {self.kind!r}; pick one of {FAMILIES}")
+
+    def tag(self) -> str:
+        """Build-relevant settings only (search knobs can change without a rebuild)."""
+        if self.kind == "hnsw":
+            return f"hnsw(m={self.hnsw_m},efc={self.hnsw_ef_construction})"
+        if self.kind == "ivf_flat":
+            return f"ivf_flat(nlist={self.ivf_nlist})"
+        if self.kind == "ivf_pq":
+            return f"ivf_pq(nlist={self.ivf_nlist},m={self.pq_m},bits={self.pq_bits})"
+        return self.kind
+
+    def resolve(self, n: int) -> str:
+        """Family to actually build for ``n`` vectors."""
+        if self.kind in _TRAINED and n < self.min_train:
+            return "flat"
+        return self.kind
+
+    def nlist(self, n: int) -> int:
+        return self.ivf_nlist or max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+    def pq_subquantizers(self, d: int) -> int:
+        m = self.pq_m or max(1, d // 16)
+        while d % m:
+            m -= 1
+        return m
+
+
+def index_kind(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8"
+    return "flat"
+
+
+def index_nbytes(index) -> int:
+    """Approximate resident size of ``index`` (codes + graph/centroids)."""
+    index = faiss.downcast_index(index)
+    n, d = index.ntotal, index.d
+    if isinstance(index, faiss.IndexHNSW):
+        return n * (d * 4 + index.hnsw.nb_neighbors(0) * 4 + 16)
+    if isinstance(index, faiss.IndexIVF):
+        return n * (index.code_size + 8) + index.nlist * d * 4
+    try:
+        return n * index.sa_code_size()
+    except RuntimeError:
+        return n * d * 4
+
+
+def build_index(spec: IndexSpec, vectors: np.ndarray) -> faiss.Index:
+    """Construct, train and fill an index of ``spec``'s family."""
+    n, d = vectors.shape
+    kind = spec.resolve(n)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, spec.hnsw_m)
+        index.hnsw.efConstruction = spec.hnsw_ef_construction
+    elif kind == "ivf_flat":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, spec.nlist(n))
+    elif kind == "ivf_pq":
+        index = faiss.IndexIVFPQ(
+            faiss.IndexFlatL2(d), d, spec.nlist(n), spec.pq_subquantizers(d), spec.pq_bits
+        )
+    elif kind == "sq8":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit)
+    else:
+        index = faiss.IndexFlatL2(d)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    tune(index, spec)
+    return index
+
+
+def tune(index, spec: IndexSpec) -> None:
+    """Apply search-time knobs (not part of the build signature).
+
+    IVF indexes also get a direct map, so vectors can be reconstructed by
+    position (the exact fallback of restricted searches, `stored_vectors`).
+    """
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = spec.hnsw_ef_search
+    elif isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(spec.ivf_nprobe, base.nlist)
+        base.make_direct_map()
+
+
+def stored_vectors(vector_store, embeddings) -> np.ndarray:
+    """All vectors in position order, exact.
+
+    Lossless families are reconstructed from the index; quantized ones are
+    re-embedded from the docstore text (hits in the embedding cache).
+    """
+    index = vector_store.index
+    n = index.ntotal
+    kind = index_kind(index)
+    if kind in _LOSSLESS:
+        if kind == "ivf_flat":
+            faiss.extract_index_ivf(index).make_direct_map()  # normally kept by `tune`
+        return index.reconstruct_n(0, n)
+    texts = [
+        vector_store.docstore.search(vector_store.index_to_docstore_id[i]).page_content
+        for i in range(n)
+    ]
+    vecs = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        faiss.normalize_L2(vecs)
+    return vecs
+
+
+def fit_index(vector_store, spec: IndexSpec, embeddings) -> bool:
+    """Convert/retrain the store's index to match ``spec``; True if rebuilt.
+
+    Happens when the family differs (including promotion from flat once a
+    class has enough vectors to train) or when an IVF index has outgrown
+    its lists (≥ 2× the nlist the data now calls for).  A trained index
+    is never demoted when deletes take a class back under ``min_train``.
+    """
+    index = vector_store.index
+    n = index.ntotal
+    have, want = index_kind(index), spec.resolve(n)
+    stale_lists = (
+        have in _TRAINED and not spec.ivf_nlist
+        and spec.nlist(n) >= 2 * faiss.extract_index_ivf(index).nlist
+    )
+    if n == 0 or (have in (want, spec.kind) and not stale_lists):
+        tune(index, spec)
+        return False
+    vector_store.index = build_index(spec, stored_vectors(vector_store, embeddings))
+    return True
+
+
+def remove_documents(vector_store, ids: Sequence[str], spec: IndexSpec, embeddings) -> None:
+    """Delete ``ids`` from the store, whatever its family.
+
+    Flat and SQ8 compact in place (LangChain's ``delete``).  HNSW can't
+    ``remove_ids`` and IVF keeps the old labels, so both are rebuilt from
+    the surviving vectors — IVF reuses its trained quantizer.
+    """
+    if index_kind(vector_store.index) in ("flat", "sq8"):
+        vector_store.delete(list(ids))
+        return
+    gone = set(ids)
+    mapping: Dict[int, str] = vector_store.index_to_docstore_id
+    keep = [pos for pos in sorted(mapping) if mapping[pos] not in gone]
+    vectors = stored_vectors(vector_store, embeddings)[keep]
+    index = vector_store.index
+    if index_kind(index) in _TRAINED:
+        index.reset()
+        index.add(vectors)
+    else:  # hnsw: rebuild the graph
+        index = build_index(replace(spec, kind="hnsw"), vectors)
+    vector_store.index = index
+    live = set(mapping.values())
+    vector_store.docstore.delete([i for i in gone if i in live])
+    vector_store.index_to_docstore_id = {new: mapping[old] for new, old in enumerate(keep)}
+
+
+# ---------------------------------------------------------------------- #
+# Trade-off report                                                       #
+# ---------------------------------------------------------------------- #
+def tradeoff_report(
+    vectors: np.ndarray,
+    specs: Sequence[IndexSpec],
+    k: int = 10,
+    n_queries: int = 200,
+    seed: int = 0,
+) -> List[Dict]:
+    """Recall@k vs flat, per-query latency and size for each spec.
+
+    Queries are stored vectors with a little Gaussian noise, so they look
+    like real queries that land near, but not exactly on, a chunk.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.01, (len(picks), vectors.shape[1])).astype(np.float32)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for spec in specs:
+        t0 = time.perf_counter()
+        try:
+            index = build_index(spec, vectors)
+        except RuntimeError as exc:  # e.g. too few vectors to train PQ codebooks
+            rows.append({"spec": spec.tag(), "error": str(exc).splitlines()[0]})
+            continue
+        build_s = time.perf_counter() - t0
+        latencies, found = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            _, ids = index.search(q[None, :], k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found.append(ids[0])
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        latencies.sort()
+        rows.append({
+            "spec": spec.tag(),
+            "built_as": index_kind(index),
+            "search": (f"efSearch={spec.hnsw_ef_search}" if spec.kind == "hnsw"
+                       else f"nprobe={spec.ivf_nprobe}" if spec.kind in _TRAINED else ""),
+            f"recall@{k}": round(float(recall), 4),
+            "p50_ms": round(latencies[len(latencies) // 2], 3),
+            "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+            "mb": round(len(faiss.serialize_index(index)) / 2**20, 2),
+            "build_s": round(build_s, 2),
+        })
+    return rows
+
+
+if __name__ == "__main__":  # python -m science.index_factory <class> [--k 10] [--queries 200]
+    import argparse
+    import json
+    import os
+
+    from dotenv import load_dotenv
+
+    from config import AppConfig
+    from science.document_manager import DocumentManager
+
+    parser = argparse.ArgumentParser(description="Recall / latency / memory per index family")
+    parser.add_argument("cls")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    cfg = AppConfig()
+    doc_mgr = DocumentManager(os.getenv("OPENAI_API_KEY", ""), cfg)
+    ctx_dir, idx_dir = doc_mgr.get_active_class_dirs(args.cls)
+    store = doc_mgr.ensure_vector_store(ctx_dir, idx_dir)
+    vecs = stored_vectors(store, store.embeddings)
+
+    base = replace(doc_mgr.index_spec(args.cls), min_train=0)
+    candidates = [replace(base, kind="flat"), replace(base, kind="sq8")]
+    candidates += [replace(base, kind="hnsw", hnsw_ef_search=ef) for ef in (16, 64, 256)]
+    for kind in _TRAINED:
+        candidates += [replace(base, kind=kind, ivf_nprobe=p) for p in (4, 16, 64)]
+    report = tradeoff_report(vecs, candidates, k=args.k, n_queries=args.queries)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.cls}: {len(vecs)} vectors, d={vecs.shape[1]}, "
+              f"current={index_kind(store.index)}")
+        for row in report:
+            print("  " + "  ".join(f"{k}={v}" for k, v in row.items()))
@@ -0,0 +1,159 @@
+"""Background indexing jobs: one queue per server process, polled by the UI."""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+import streamlit as st
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class IndexJob:
+    """Progress of one class sync; written by the worker, read by any session."""
+    class_name: str
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    state: str = QUEUED
+    submitted: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    files_total: int = 0
+    files_done: int = 0
+    chunks: int = 0
+    current: str | None = None
+    errors: List[Tuple[str, str]] = field(default_factory=list)  # (file, reason)
+    failure: str | None = None
+    key: object = None  # what the job was asked to sync; see `JobRegistry.submit`
+
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    # ---- progress hooks (worker thread) ------------------------------ #
+    def begin(self, files_total: int) -> None:
+        self.files_total = files_total
+
+    def file_parsed(self, name: str, error: str | None = None) -> None:
+        self.files_done += 1
+        self.current = name
+        if error:
+            self.errors.append((name, error))
+
+    def chunks_indexed(self, n: int) -> None:
+        self.chunks += n
+
+    def snapshot(self) -> Dict:
+        secs = self.elapsed
+        return {
+            "job_id": self.job_id,
+            "class": self.class_name,
+            "state": self.state,
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "progress": round(self.files_done / self.files_total, 3) if self.files_total else 0.0,
+            "current": self.current,
+            "chunks": self.chunks,
+            "files_per_s": round(self.files_done / secs, 2) if secs else 0.0,
+            "chunks_per_s": round(self.chunks / secs, 1) if secs else 0.0,
+            "elapsed_s": round(secs, 1),
+            "errors": list(self.errors),
+            "failure": self.failure,
+        }
+
+
+class JobRegistry:
+    """Runs class syncs on a small thread pool and keeps their recent history.
+
+    At most one job per class is queued or running.  A sync diffs the class
+    folder when it starts; files saved while it runs are picked up by the
+    next submit, which the app makes on the rerun after it publishes.
+    """
+
+    def __init__(self, workers: int = 1, history: int = 20):
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-job")
+        self._jobs: List[IndexJob] = []
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                         #
+    # ------------------------------------------------------------------ #
+    def submit(
+        self,
+        class_name: str,
+        work: Callable[[IndexJob], object],
+        key: object = None,
+        retry: bool = False,
+    ) -> IndexJob:
+        """Queue ``work(job)`` for ``class_name``, or return its active job.
+
+        ``key`` identifies the state being synced (e.g. the pending file
+        changes).  If the class's last job already finished on the same
+        key, it is returned instead of running the same sync again — a
+        failing sync is retried only once its inputs change, or on
+        ``retry``.
+        """
+        with self._lock:
+            last = next((j for j in reversed(self._jobs) if j.class_name == class_name), None)
+            if last is not None and (
+                last.active or (key is not None and last.key == key and not retry)
+            ):
+                return last  # only the newest job of a class can be active
+            job = IndexJob(class_name, key=key)
+            self._jobs.append(job)
+            self._trim()
+        self._pool.submit(self._run, job, work)
+        return job
+
+    def latest(self, class_name: str) -> IndexJob | None:
+        with self._lock:
+            for job in reversed(self._jobs):
+                if job.class_name == class_name:
+                    return job
+        return None
+
+    def active(self) -> List[IndexJob]:
+        with self._lock:
+            return [j for j in self._jobs if j.active]
+
+    def snapshot(self) -> List[Dict]:
+        """Newest first."""
+        with self._lock:
+            return [j.snapshot() for j in reversed(self._jobs)]
+
+    # ------------------------------------------------------------------ #
+    # Internal helpers                                                   #
+    # ------------------------------------------------------------------ #
+    def _run(self, job: IndexJob, work: Callable[[IndexJob], object]) -> None:
+        job.state, job.started = RUNNING, time.time()
+        try:
+            work(job)
+            job.state = DONE
+        except Exception as exc:  # surfaced in the sidebar, not raised on a dead thread
+            job.failure = f"{type(exc).__name__}: {exc}"
+            job.state = FAILED
+        finally:
+            job.finished = time.time()
+            job.current = None
+
+    def _trim(self) -> None:
+        finished = [j for j in self._jobs if not j.active]
+        for job in finished[: max(0, len(self._jobs) - self.history)]:
+            self._jobs.remove(job)
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_registry(workers: int) -> JobRegistry:
+    """One job queue per server process, shared by every Streamlit session."""
+    return JobRegistry(workers=workers)
@@ -0,0 +1,122 @@
+"""Per-class manifest mapping source files to the vector IDs they produced."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List
+
+
+@dataclass
+class FileEntry:
+    """What we knew about a file the last time it was indexed."""
+    size: int
+    mtime_ns: int
+    sha256: str
+    ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ManifestDiff:
+    """Result of comparing the manifest against the class folder."""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    touched: Dict[str, FileEntry] = field(default_factory=dict)  # mtime only
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed or self.touched)
+
+
+def file_sha256(path: str, block: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def vector_id_stem(file_name: str, sha256: str) -> str:
+    """Deterministic, collision-safe prefix for one file's vector IDs."""
+    return hashlib.sha1(f"{file_name}\0{sha256}".encode()).hexdigest()[:16]
+
+
+class IndexManifest:
+    """JSON manifest stored next to the FAISS files inside ``idx_dir``.
+
+    ``signature`` captures the build settings (chunking, embedding model);
+    a manifest written under different settings is treated as absent.
+    """
+
+    FILENAME = "manifest.json"
+
+    def __init__(self, signature: str, entries: Dict[str, FileEntry] | None = None):
+        self.signature = signature
+        self.entries: Dict[str, FileEntry] = entries or {}
+
+    # ------------------------------------------------------------------ #
+    # Persistence                                                        #
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def load(cls, idx_dir: str, signature: str) -> "IndexManifest | None":
+        """Return the saved manifest, or None if there isn't a usable one."""
+        path = os.path.join(idx_dir, cls.FILENAME)
+        try:
+            with open(path, encoding="utf-8") as f:
+                raw = json.load(f)
+            if raw.get("signature") != signature:
+                return None
+            files = raw["files"]
+            return cls(signature, {name: FileEntry(**e) for name, e in files.items()})
+        except (FileNotFoundError, ValueError, TypeError, KeyError, AttributeError):
+            return None
+
+    def save(self, idx_dir: str) -> None:
+        os.makedirs(idx_dir, exist_ok=True)
+        path = os.path.join(idx_dir, self.FILENAME)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "signature": self.signature,
+                    "files": {n: asdict(e) for n, e in self.entries.items()},
+                },
+                f,
+                indent=1,
+            )
+        os.replace(tmp, path)
+
+    # ------------------------------------------------------------------ #
+    # Diffing                                                            #
+    # ------------------------------------------------------------------ #
+    def diff(self, ctx_dir: str, extensions: Iterable[str]) -> ManifestDiff:
+        """Compare against ``ctx_dir``; only files whose stat changed are hashed."""
+        exts = {e.lower() for e in extensions}
+        result = ManifestDiff()
+        present = set()
+
+        if os.path.isdir(ctx_dir):
+            for item in os.scandir(ctx_dir):
+                if not item.is_file() or item.name.rsplit(".", 1)[-1].lower() not in exts:
+                    continue
+                present.add(item.name)
+                st = item.stat()
+                old = self.entries.get(item.name)
+                if old is None:
+                    result.added.append(item.name)
+                elif (old.size, old.mtime_ns) != (st.st_size, st.st_mtime_ns):
+                    if file_sha256(item.path) == old.sha256:
+                        result.touched[item.name] = FileEntry(
+                            st.st_size, st.st_mtime_ns, old.sha256, old.ids
+                        )
+                    else:
+                        result.changed.append(item.name)
+
+        result.removed = [n for n in self.entries if n not in present]
+        result.added.sort()
+        result.changed.sort()
+        return result
+
+    def ids_for(self, names: Iterable[str]) -> List[str]:
+        return [i for n in names if n in self.entries for i in self.entries[n].ids]
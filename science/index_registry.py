@@ -0,0 +1,138 @@
+"""Process-wide registry of loaded FAISS indexes shared across sessions."""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple
+
+import streamlit as st
+
+from science.index_factory import index_nbytes
+
+
+@dataclass
+class RegistryStats:
+    """Counters exposed for the sidebar / tracing panels."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    load_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def estimate_index_bytes(vector_store) -> int:
+    """Rough resident size of a LangChain FAISS store (index + in-memory docstore text)."""
+    index = getattr(vector_store, "index", None)
+    size = index_nbytes(index) if index is not None else 0
+    store = getattr(getattr(vector_store, "docstore", None), "_dict", {}) or {}
+    size += sum(len(d.page_content) + 64 for d in store.values())
+    return size
+
+
+class IndexRegistry:
+    """LRU cache of vector stores keyed by (class name, index version).
+
+    A class only ever has one live version: loading a newer version drops the
+    older one.  Total memory is bounded by ``max_bytes``; the least recently
+    used class is evicted first (the most recent entry is always kept).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.stats = RegistryStats()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[object, int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                         #
+    # ------------------------------------------------------------------ #
+    def get_or_load(
+        self,
+        class_name: str,
+        version: str,
+        loader: Callable[[], object],
+        sizeof: Callable[[object], int] = estimate_index_bytes,
+    ):
+        """Return the cached store for this version, loading it on a miss."""
+        key = (class_name, version)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return self._entries[key][0]
+
+        start = time.perf_counter()
+        value = loader()
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.load_seconds += elapsed
+            self._insert(key, value, sizeof(value))
+        return value
+
+    def put(
+        self,
+        class_name: str,
+        version: str,
+        value,
+        sizeof: Callable[[object], int] = estimate_index_bytes,
+    ) -> None:
+        """Register a freshly built store so the next lookup is a hit."""
+        with self._lock:
+            self._insert((class_name, version), value, sizeof(value))
+
+    def build_lock(self, class_name: str) -> threading.Lock:
+        """Per-class lock so at most one build of a class runs at a time."""
+        with self._lock:
+            return self._build_locks.setdefault(class_name, threading.Lock())
+
+    def invalidate(self, class_name: str) -> None:
+        """Drop every cached version of ``class_name`` (cheap, no disk I/O)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == class_name]:
+                del self._entries[key]
+                self.stats.invalidations += 1
+
+    def snapshot(self) -> Dict:
+        """Plain-dict view of the counters and current residency."""
+        with self._lock:
+            return {
+                "hits": self.stats.hits,
+                "misses": self.stats.misses,
+                "hit_rate": round(self.stats.hit_rate, 3),
+                "evictions": self.stats.evictions,
+                "invalidations": self.stats.invalidations,
+                "load_seconds": round(self.stats.load_seconds, 3),
+                "resident_mb": round(self._total_bytes() / 2**20, 1),
+                "classes": [k[0] for k in self._entries],
+            }
+
+    # ------------------------------------------------------------------ #
+    # Internal helpers                                                   #
+    # ------------------------------------------------------------------ #
+    def _insert(self, key: Tuple[str, str], value, nbytes: int) -> None:
+        for stale in [k for k in self._entries if k[0] == key[0] and k != key]:
+            del self._entries[stale]
+        self._entries[key] = (value, nbytes)
+        self._entries.move_to_end(key)
+        while self._total_bytes() > self.max_bytes and len(self._entries) > 1:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _total_bytes(self) -> int:
+        return sum(n for _, n in self._entries.values())
+
+
+@st.cache_resource(show_spinner=False)
+def get_index_registry(max_mb: int) -> IndexRegistry:
+    """One registry per server process, shared by every Streamlit session."""
+    return IndexRegistry(max_bytes=max_mb * 2**20)
@@ -0,0 +1,148 @@
+"""Persisted, incrementally updated BM25 inverted index over chunk texts."""
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with which who what when where how".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric runs, so 's.551' and 's 551' both give '551'."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 (Okapi) over an inverted index keyed by vector ID.
+
+    ``rank_bm25`` rebuilds its statistics from the full corpus on every
+    construction; keeping our own postings lets a single file be added or
+    removed and the index be saved next to the FAISS files as JSON.
+    """
+
+    FILENAME = "lexical.json"
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self._total_len = 0
+
+    # ------------------------------------------------------------------ #
+    # Maintenance                                                        #
+    # ------------------------------------------------------------------ #
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        for doc_id, text in zip(ids, texts):
+            terms = Counter(tokenize(text))
+            self.doc_len[doc_id] = sum(terms.values())
+            self._total_len += self.doc_len[doc_id]
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, ids: Iterable[str]) -> None:
+        gone = {i for i in ids if i in self.doc_len}
+        if not gone:
+            return
+        for doc_id in gone:
+            self._total_len -= self.doc_len.pop(doc_id)
+        for term in list(self.postings):
+            plist = self.postings[term]
+            for doc_id in gone.intersection(plist):
+                del plist[doc_id]
+            if not plist:
+                del self.postings[term]
+
+    # ------------------------------------------------------------------ #
+    # Query                                                              #
+    # ------------------------------------------------------------------ #
+    def search(
+        self,
+        query: str,
+        k: int,
+        keep: Callable[[str], bool] | None = None,
+        scores: Dict[str, float] | None = None,
+    ) -> List[Tuple[str, float]]:
+        """Top-k (vector id, BM25 score); ``keep`` optionally filters ids.
+
+        Pass ``scores`` from `score_all` to rank several subsets of the same
+        query without rescoring.
+        """
+        if scores is None:
+            scores = self.score_all(query)
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        if keep is not None:
+            ranked = [kv for kv in ranked if keep(kv[0])]
+        return ranked[:k]
+
+    def score_all(self, query: str) -> Dict[str, float]:
+        """BM25 score of every document containing at least one query term."""
+        n = len(self.doc_len)
+        if not n:
+            return {}
+        avg = self._total_len / n or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc_id, tf in plist.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return scores
+
+    def nbytes(self) -> int:
+        return 64 * len(self.doc_len) + sum(48 * len(p) + 64 for p in self.postings.values())
+
+    # ------------------------------------------------------------------ #
+    # Persistence                                                        #
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def load(cls, idx_dir: str) -> "LexicalIndex | None":
+        try:
+            with open(os.path.join(idx_dir, cls.FILENAME), encoding="utf-8") as f:
+                raw = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        index = cls(raw.get("k1", 1.5), raw.get("b", 0.75))
+        index.postings = raw["postings"]
+        index.doc_len = raw["doc_len"]
+        index._total_len = sum(index.doc_len.values())
+        return index
+
+    @classmethod
+    def from_docstore(cls, index_to_docstore_id: Dict[int, str], docstore) -> "LexicalIndex":
+        """Backfill for indexes saved before the lexical index existed."""
+        index = cls()
+        ids = list(index_to_docstore_id.values())
+        index.add(ids, (docstore.search(i).page_content for i in ids))
+        return index
+
+    def save(self, idx_dir: str) -> None:
+        path = os.path.join(idx_dir, self.FILENAME)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"k1": self.k1, "b": self.b, "doc_len": self.doc_len, "postings": self.postings},
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp, path)
+
+
+def rrf_scores(*rankings: List[str], k: int = 60) -> Dict[str, float]:
+    """Reciprocal-rank-fusion score of every id in several ranked lists."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return scores
@@ -1,12 +1,131 @@
 """Conversation memory wrapper around LangChain memories with Streamlit state."""
 from __future__ import annotations
 
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
 import streamlit as st
 from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryBufferMemory
+from langchain_community.callbacks import get_openai_callback
 from langchain_openai import ChatOpenAI
 
 from config import AppConfig
 
+log = logging.getLogger(__name__)
+
+
+@st.cache_resource(show_spinner=False)
+def _summary_executor() -> ThreadPoolExecutor:
+    """Shared by all sessions; summarisation is network-bound."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+
+
+@dataclass
+class SummaryStats:
+    turns: int = 0
+    passes: int = 0
+    llm_tokens: int = 0
+    llm_cost: float = 0.0
+    last_lag_s: float = 0.0
+    max_lag_s: float = 0.0
+    errors: int = 0
+    last_error: str | None = None
+
+
+class SummaryWorker:
+    """Keeps summary memories up to date off the request path.
+
+    `submit` only queues the turn.  A single drain job per session applies
+    every queued turn to its memory in one go (one summarisation call for
+    several turns when they pile up) and then publishes the summary text,
+    which readers pick up without waiting.
+    """
+
+    def __init__(self):
+        self.stats = SummaryStats()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[object, str, str, float]] = []
+        self._scheduled = False
+        self._published: Dict[int, str] = {}
+
+    def submit(self, memory, user_text: str, assistant_text: str) -> None:
+        with self._lock:
+            self._pending.append((memory, user_text, assistant_text, time.monotonic()))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        _summary_executor().submit(self._drain)
+
+    def latest(self, memory) -> str:
+        """Last finished summary for this memory ('' before the first one)."""
+        return self._published.get(id(memory), "")
+
+    def snapshot(self) -> Dict:
+        return {
+            "pending": len(self._pending),
+            "passes": self.stats.passes,
+            "turns": self.stats.turns,
+            "last_lag_s": round(self.stats.last_lag_s, 2),
+            "max_lag_s": round(self.stats.max_lag_s, 2),
+            "llm_tokens": self.stats.llm_tokens,
+            "llm_cost": round(self.stats.llm_cost, 4),
+            "errors": self.stats.errors,
+            "last_error": self.stats.last_error,
+        }
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    self._scheduled = False
+                    return
+
+            grouped: Dict[int, Tuple[object, List[Tuple[str, str]]]] = {}
+            for memory, user_text, assistant_text, _ in batch:
+                grouped.setdefault(id(memory), (memory, []))[1].append((user_text, assistant_text))
+
+            try:
+                with get_openai_callback() as cb:
+                    for memory, turns in grouped.values():
+                        self._apply(memory, turns)
+                        self._published[id(memory)] = (
+                            memory.load_memory_variables({}).get("history", "")
+                        )
+                self.stats.llm_tokens += cb.total_tokens
+                self.stats.llm_cost += cb.total_cost
+            except Exception as exc:  # keep the worker alive; next turn retries
+                self.stats.errors += 1
+                self.stats.last_error = f"{type(exc).__name__}: {exc}"
+                log.warning("summary pass failed", exc_info=True)
+
+            lag = time.monotonic() - min(t for *_, t in batch)
+            self.stats.passes += 1
+            self.stats.turns += len(batch)
+            self.stats.last_lag_s = lag
+            self.stats.max_lag_s = max(self.stats.max_lag_s, lag)
+
+    @staticmethod
+    def _apply(memory, turns: List[Tuple[str, str]]) -> None:
+        if isinstance(memory, ConversationSummaryBufferMemory):
+            for user_text, assistant_text in turns:
+                memory.chat_memory.add_user_message(user_text)
+                memory.chat_memory.add_ai_message(assistant_text)
+            memory.prune()  # at most one summarisation call for the whole batch
+            return
+        # plain ConversationSummaryMemory: fold all turns in with one call
+        before = len(memory.chat_memory.messages)
+        for user_text, assistant_text in turns:
+            memory.chat_memory.add_user_message(user_text)
+            memory.chat_memory.add_ai_message(assistant_text)
+        memory.buffer = memory.predict_new_summary(
+            memory.chat_memory.messages[before:], memory.buffer
+        )
+
 
 class MemoryManager:
     """Sets up and maintains the two‑tier memory architecture."""
@@ -18,11 +137,16 @@ class MemoryManager:
         # 🔹 use the persisted memories, don’t create new ones
         self.window  = st.session_state.window_memory
         self.summary = st.session_state.summary_memory
+        self.summary_worker = st.session_state.setdefault("summary_worker", SummaryWorker())
          
     def save_turn(self, user_text: str, assistant_text: str) -> None:
-        """Record the latest exchange in both memories."""
+        """Record the latest exchange; the summary is updated in the background."""
         self.window.save_context({"input": user_text}, {"output": assistant_text})
-        self.summary.save_context({"input": user_text}, {"output": assistant_text})
+        self.summary_worker.submit(self.summary, user_text, assistant_text)
+
+    def latest_summary(self) -> str:
+        """Most recent finished summary — never waits for one in progress."""
+        return self.summary_worker.latest(self.summary)
 
     def _new_window(self):
         return ConversationBufferWindowMemory(
@@ -0,0 +1,215 @@
+"""OCR for scanned PDF pages and image uploads, cached by page-image hash.
+
+Tesseract runs as a subprocess per image, so a thread pool is enough to
+keep every core busy.  Inside a parse worker process the pool defaults to
+a single thread: the parse pool already runs one file per core, so total
+tesseract processes stay at about one per core.  Results are stored one
+file per image under ``OCR_CACHE_DIR``; writes are atomic, so parse
+workers in separate processes can share the cache safely.
+
+OCR only ever adds text: an image that can't be decoded or OCR'd (no
+tesseract, JBIG2 data, ...) is logged and skipped, and its page keeps
+whatever text layer it had.  Such pages are flagged ``ocr_skipped`` so the
+parse cache doesn't keep the degraded result.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+import pytesseract
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.document_loaders.base import BaseLoader
+from langchain_core.documents import Document
+from PIL import Image, ImageSequence
+from pypdf import PdfReader
+
+from config import AppConfig
+
+log = logging.getLogger(__name__)
+
+OCRTask = Tuple[bytes, Callable[[], Image.Image]]  # (bytes to hash, image opener)
+
+# each tesseract process single-threaded; parallelism comes from running several
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+_reported: set = set()  # failure kinds already logged by this process
+_reported_lock = threading.Lock()
+
+
+def _report(exc: Exception) -> None:
+    """Log each kind of OCR failure once per process, not once per image."""
+    kind = type(exc).__name__
+    with _reported_lock:
+        if kind in _reported:
+            return
+        _reported.add(kind)
+    log.warning("OCR skipped (%s: %s); pages keep their text layer", kind, exc)
+
+
+class OCRCache:
+    """Page text keyed by sha256(image bytes, language, tesseract config).
+
+    With ``root=None`` nothing is read or written: OCR of uploads that must
+    not outlive the session.
+    """
+
+    def __init__(self, root: str | None, lang: str = "eng", config: str = ""):
+        self.root = root
+        self.lang = lang
+        self.config = config
+
+    def key(self, data: bytes) -> str:
+        h = hashlib.sha256(f"{self.lang}\0{self.config}\0".encode())
+        h.update(data)
+        return h.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        if self.root is None:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, text: str) -> None:
+        if self.root is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.txt")
+
+
+def ocr_images(
+    tasks: Sequence[OCRTask], cache: OCRCache, workers: int = 0
+) -> List[str | None]:
+    """Text for each task, in order; only cache misses reach tesseract.
+
+    A task whose image can't be opened or OCR'd yields None.
+    ``workers=0`` means one per core in the main process, one inside a
+    parse worker (whose siblings already occupy the other cores).
+    """
+
+    def run(task: OCRTask) -> str | None:
+        data, open_image = task
+        key = cache.key(data)
+        text = cache.get(key)
+        if text is None:
+            try:
+                text = pytesseract.image_to_string(
+                    open_image(), lang=cache.lang, config=cache.config
+                )
+            except Exception as exc:  # missing tesseract, undecodable image, ...
+                _report(exc)
+                return None
+            cache.put(key, text)
+        return text
+
+    if not workers:
+        workers = 1 if multiprocessing.parent_process() is not None else os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        return [run(t) for t in tasks]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr") as pool:
+        return list(pool.map(run, tasks))
+
+
+def _page_images(page) -> List | None:
+    """The page's images, or None if any of them can't be decoded.
+
+    pypdf decodes each image as it is fetched, which fails on e.g. JBIG2
+    or CCITT data.
+    """
+    try:
+        return list(page.images)
+    except Exception as exc:
+        _report(exc)
+        return None
+
+
+def _cache(cfg: AppConfig) -> OCRCache:
+    return OCRCache(cfg.OCR_CACHE_DIR, cfg.OCR_LANG)
+
+
+class OCRPDFLoader(PyPDFLoader):
+    """``PyPDFLoader`` that OCRs the images of pages with no usable text layer.
+
+    A page counts as scanned when its extracted text is shorter than
+    ``OCR_MIN_CHARS``; those pages are OCR'd together on a thread pool.
+    """
+
+    # parse-cache key part: anything that changes which pages get OCR'd, or how
+    VERSION = f"ocr1-{AppConfig.OCR_LANG}-min{AppConfig.OCR_MIN_CHARS}"
+
+    def __init__(self, file_path: str, **kwargs):
+        super().__init__(file_path, **kwargs)
+        self.cfg = AppConfig()
+        self.ocr_cache = _cache(self.cfg)
+
+    def lazy_load(self) -> Iterator[Document]:
+        pages = list(super().lazy_load())
+        scanned = [
+            i for i, doc in enumerate(pages)
+            if len(doc.page_content.strip()) < self.cfg.OCR_MIN_CHARS
+        ]
+        if scanned:
+            reader = PdfReader(self.file_path)
+            tasks, owners = [], []
+            for i in scanned:
+                images = _page_images(reader.pages[pages[i].metadata.get("page", i)])
+                if images is None:
+                    pages[i].metadata["ocr_skipped"] = True
+                    continue
+                for img in images:
+                    tasks.append((img.data, lambda img=img: img.image))
+                    owners.append(i)
+            texts = ocr_images(tasks, self.ocr_cache, self.cfg.OCR_WORKERS)
+            ocr_text = {}
+            for i, text in zip(owners, texts):
+                if text is None:
+                    pages[i].metadata["ocr_skipped"] = True
+                    continue
+                ocr_text.setdefault(i, []).append(text.strip())
+            for i, parts in ocr_text.items():
+                text = "\n".join(p for p in parts if p)
+                if len(text) > len(pages[i].page_content.strip()):  # e.g. not just a logo
+                    pages[i].page_content = text
+                    pages[i].metadata["ocr"] = True
+        yield from pages
+
+
+class ImageOCRLoader(BaseLoader):
+    """One document per image frame (multi-page TIFFs give several)."""
+
+    VERSION = f"ocr1-{AppConfig.OCR_LANG}"
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.cfg = AppConfig()
+        self.ocr_cache = _cache(self.cfg)
+
+    def lazy_load(self) -> Iterator[Document]:
+        with Image.open(self.file_path) as img:
+            frames = [frame.convert("RGB") for frame in ImageSequence.Iterator(img)]
+        tasks = [
+            (f"{frame.size}".encode() + frame.tobytes(), lambda frame=frame: frame)
+            for frame in frames
+        ]
+        texts = ocr_images(tasks, self.ocr_cache, self.cfg.OCR_WORKERS)
+        for page, text in enumerate(texts):
+            meta = {"source": self.file_path, "page": page, "ocr": True}
+            if text is None:
+                meta["ocr_skipped"] = True
+            yield Document(page_content=(text or "").strip(), metadata=meta)
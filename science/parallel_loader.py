@@ -0,0 +1,229 @@
+"""Parse + chunk files on a bounded process pool with per-file isolation."""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from science.index_manifest import file_sha256
+from science.ocr import OCRCache
+from science.parse_cache import ParseCache, loader_version
+
+ParseCacheSpec = Tuple[str, int]  # (SQLite path, max bytes); picklable for workers
+
+# Never fork: the Streamlit server has live threads (embedding event loop,
+# index jobs) and SQLite handles whose locks a forked child could inherit held.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+@dataclass
+class ParseResult:
+    """Outcome for one file; ``error`` is set instead of raising."""
+    path: str
+    docs: List[Document] = field(default_factory=list)
+    error: str | None = None
+    seconds: float = 0.0
+    sha256: str | None = None  # set when the parse cache was consulted
+    cached: bool = False
+
+
+def _read(path: str, loader_cls, persist: bool) -> List[Document]:
+    loader = loader_cls(path)
+    if not persist and isinstance(getattr(loader, "ocr_cache", None), OCRCache):
+        loader.ocr_cache = OCRCache(None, loader.ocr_cache.lang, loader.ocr_cache.config)
+    return list(loader.lazy_load())
+
+
+def _load_pages(
+    path: str,
+    loader_cls,
+    cache: ParseCacheSpec | None,
+    result: ParseResult,
+    persist: bool = True,
+) -> List[Document]:
+    """Loader output, from the parse cache when this content was seen before.
+
+    With ``persist=False`` no cache is read or written (parse or OCR), so
+    nothing of the file is left on disk.
+    """
+    if cache is None or not persist:
+        return _read(path, loader_cls, persist)
+    result.sha256 = file_sha256(path)
+    key = f"{result.sha256}:{loader_version(loader_cls)}"
+    try:
+        store = ParseCache(*cache)
+    except sqlite3.Error:  # unusable cache: parse as if it weren't there
+        return _read(path, loader_cls, persist)
+    pages = None
+    try:
+        pages = store.get(key, path)
+        if pages is not None:
+            result.cached = True
+            return pages
+        pages = _read(path, loader_cls, persist)
+        if not any(d.metadata.get("ocr_skipped") for d in pages):  # retry OCR next time
+            store.put(key, path, pages)
+        return pages
+    except sqlite3.Error:
+        return pages if pages is not None else _read(path, loader_cls, persist)
+    finally:
+        store.close()
+
+
+def parse_file(
+    path: str,
+    chunking: Tuple[int, int, str],
+    cache: ParseCacheSpec | None = None,
+    persist: bool = True,
+) -> ParseResult:
+    """Load and chunk one file. Runs inside a worker process.
+
+    The chunks come back as one list because they have to be pickled to
+    the parent; `chunk_documents` stays lazy within the file, and the
+    parent holds at most one result per worker (plus any that finished
+    out of order) rather than the whole folder.
+    """
+    from science.document_manager import DocumentManager, chunk_documents
+
+    start = time.perf_counter()
+    result = ParseResult(path)
+    try:
+        loader_cls = DocumentManager.LOADER_MAP.get(path.rsplit(".", 1)[-1].lower())
+        if loader_cls is None:
+            result.error = "unsupported file type"
+            return result
+        pages = _load_pages(path, loader_cls, cache, result, persist)
+        result.docs = list(chunk_documents(pages, *chunking))
+    except Exception as exc:  # isolate: one bad file must not kill the build
+        result.error = f"{type(exc).__name__}: {exc}"
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def parse_files(
+    paths: Sequence[str],
+    chunking: Tuple[int, int, str],
+    workers: int = 0,
+    timeout: float = 300.0,
+    cache: ParseCacheSpec | None = None,
+    persist: bool = True,
+) -> Iterator[ParseResult]:
+    """Yield one ParseResult per path, in input order, parsing in parallel.
+
+    At most ``workers`` files are in flight, so each file's ``timeout`` runs
+    from when it actually starts.  A file that times out gets an error
+    result.  When a worker crashes, every file that was in flight becomes a
+    suspect and is retried alone, so only the culprit ends up failing.
+    With ``cache``, files whose content was parsed before skip the loader;
+    ``persist=False`` keeps every cache (parse and OCR) out of it.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        for p in paths:
+            yield parse_file(p, chunking, cache, persist)
+        return
+
+    results: Dict[int, ParseResult] = {}
+    in_flight: Dict[Future, Tuple[int, float]] = {}
+    queue = deque(range(len(paths)))
+    suspects: set = set()
+    next_yield = 0
+    pool = _new_pool(min(workers, len(paths)))
+    try:
+        while next_yield < len(paths):
+            while queue and len(in_flight) < workers:
+                if any(i in suspects for i, _ in in_flight.values()):
+                    break  # a suspect is running solo
+                if queue[0] in suspects and in_flight:
+                    break
+                i = queue.popleft()
+                in_flight[pool.submit(parse_file, paths[i], chunking, cache, persist)] = (
+                    i, time.monotonic() + timeout
+                )
+
+            nearest = min(deadline for _, deadline in in_flight.values())
+            done, _ = wait(in_flight, timeout=max(0.0, nearest - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            crashed = False
+            for fut in done:
+                i, _ = in_flight.pop(fut)
+                try:
+                    results[i] = fut.result()
+                except BrokenProcessPool:
+                    crashed = True
+                    if i in suspects:  # it was running alone: definitely the culprit
+                        results[i] = ParseResult(paths[i], error="worker process crashed")
+                    else:
+                        suspects.add(i)
+                        queue.appendleft(i)
+
+            now = time.monotonic()
+            timed_out = [f for f, (_, deadline) in in_flight.items() if deadline <= now]
+            for fut in timed_out:
+                i, _ = in_flight.pop(fut)
+                results[i] = ParseResult(paths[i], error=f"timed out after {timeout:.0f}s")
+
+            if crashed or timed_out:
+                # a dead or hung worker poisons the pool: start a fresh one and
+                # requeue whatever was in flight alongside it
+                for fut, (i, _) in in_flight.items():
+                    fut.cancel()
+                    if crashed:
+                        suspects.add(i)
+                    queue.appendleft(i)
+                in_flight.clear()
+                _kill(pool)
+                pool = _new_pool(min(workers, len(paths)))
+
+            while next_yield in results:
+                yield results.pop(next_yield)
+                next_yield += 1
+    finally:
+        if in_flight:  # abandoned mid-build (e.g. the consumer stopped early)
+            _kill(pool)
+        else:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _new_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT)
+
+
+def _kill(pool: ProcessPoolExecutor) -> None:
+    """Shut ``pool`` down without waiting, terminating workers still busy.
+
+    ``shutdown(wait=False)`` alone leaves a hung parse running until it
+    finishes on its own, holding a core and its memory.
+    """
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proc in processes:
+        if proc.is_alive():
+            proc.terminate()
+
+
+if __name__ == "__main__":  # python -m science.parallel_loader <folder> [workers ...]
+    import sys
+
+    from config import AppConfig
+
+    cfg = AppConfig()
+    folder = sys.argv[1]
+    files = sorted(os.path.join(folder, f) for f in os.listdir(folder))
+    for n in [int(a) for a in sys.argv[2:]] or [1, os.cpu_count() or 1]:
+        t0 = time.perf_counter()
+        out = list(parse_files(files, (cfg.CHUNK_TOKENS, cfg.CHUNK_OVERLAP, cfg.TOKEN_ENCODING),
+                               workers=n, timeout=cfg.PARSE_TIMEOUT_S))
+        chunks = sum(len(r.docs) for r in out)
+        errors = sum(r.error is not None for r in out)
+        print(f"workers={n:<3} files={len(out)} chunks={chunks} errors={errors} "
+              f"wall={time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,86 @@
+"""On-disk cache of loader output keyed by file content hash + loader version."""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import List
+
+import langchain_community
+from langchain_core.documents import Document
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (
+    key       TEXT PRIMARY KEY,
+    data      BLOB NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+"""
+_PATH = "\0path"  # stands in for the parsed file's path inside stored metadata
+
+
+def loader_version(loader_cls) -> str:
+    """Changes whenever the loader (or the LangChain release behind it) may parse differently."""
+    return (
+        f"{loader_cls.__module__}.{loader_cls.__qualname__}"
+        f":{getattr(loader_cls, 'VERSION', 0)}:{langchain_community.__version__}"
+    )
+
+
+class ParseCache:
+    """Page text + metadata per (sha256, loader version), zlib'd JSON in SQLite.
+
+    Parse workers in separate processes each open their own connection;
+    SQLite's locking keeps them consistent.  Past ``max_bytes`` the least
+    recently used entries are dropped (down to 80 % of the cap).  Stored
+    metadata has the file's path swapped for a placeholder, so identical
+    content under another name or folder still hits.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key: str, path: str) -> List[Document] | None:
+        row = self._conn.execute("SELECT data FROM parsed WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self._conn:
+            self._conn.execute("UPDATE parsed SET last_used = ? WHERE key = ?", (time.time(), key))
+        return [
+            Document(page_content=text, metadata={k: path if v == _PATH else v for k, v in meta.items()})
+            for text, meta in json.loads(zlib.decompress(row[0]))
+        ]
+
+    def put(self, key: str, path: str, docs: List[Document]) -> None:
+        data = zlib.compress(json.dumps([
+            (d.page_content, {k: _PATH if v == path else v for k, v in d.metadata.items()})
+            for d in docs
+        ], default=str).encode("utf-8"))
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parsed (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._evict()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM parsed").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target, doomed = int(self.max_bytes * 0.8), []
+        for key, size in self._conn.execute("SELECT key, size FROM parsed ORDER BY last_used"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM parsed WHERE key = ?", doomed)
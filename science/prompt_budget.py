@@ -0,0 +1,178 @@
+"""Token-budgeted prompt assembly: system, summary, context, window, facts."""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from science.tokens import count_tokens, truncate_tokens
+
+MESSAGE_OVERHEAD = 4  # role/separator tokens the chat format adds per message
+_MIN_TRUNCATED = 48  # a snippet cut shorter than this isn't worth citing
+
+
+@dataclass
+class PromptUsage:
+    """Per-turn token breakdown, by prompt section."""
+    sections: Dict[str, int] = field(default_factory=dict)
+    kept: List[int] = field(default_factory=list)  # citation ids, rank order
+    truncated: List[int] = field(default_factory=list)
+    dropped: List[int] = field(default_factory=list)
+    duplicates: List[int] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return sum(self.sections.values())
+
+    def as_dict(self) -> Dict:
+        return {
+            **self.sections,
+            "total": self.total,
+            "snippets_kept": len(self.kept),
+            "snippets_truncated": len(self.truncated),
+            "snippets_dropped": len(self.dropped),
+            "snippets_duplicate": len(self.duplicates),
+        }
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class PromptBuilder:
+    """Fits a chat prompt into ``max_tokens`` with per-section caps.
+
+    The system prompt and user message are always sent.  Summary, window
+    and facts are each held to their cap (oldest window turns and facts go
+    first); the context section gets its cap plus whatever those sections
+    left unused.  Snippets arrive in rank order: duplicates are removed,
+    then the lowest-ranked ones are truncated or dropped to fit.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        summary_tokens: int,
+        context_tokens: int,
+        window_tokens: int,
+        facts_tokens: int,
+        encoding: str = "cl100k_base",
+    ):
+        self.max_tokens = max_tokens
+        self.caps = {
+            "summary": summary_tokens,
+            "context": context_tokens,
+            "window": window_tokens,
+            "facts": facts_tokens,
+        }
+        self.encoding = encoding
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                         #
+    # ------------------------------------------------------------------ #
+    def build(
+        self,
+        system: str,
+        summary: str,
+        snippets: Sequence[Tuple[int, str]],
+        window: Sequence[BaseMessage],
+        facts: Sequence[str],
+        user_text: str,
+    ) -> Tuple[List[BaseMessage], PromptUsage]:
+        usage = PromptUsage()
+        fixed = self._size(system) + self._size(user_text)
+        room = max(0, self.max_tokens - fixed)
+
+        summary_msg, n_summary = self._fit_summary(summary, min(room, self.caps["summary"]))
+        room -= n_summary
+        window_msgs, n_window = self._fit_tail(
+            list(window), min(room, self.caps["window"]), lambda m: m.content
+        )
+        room -= n_window
+        fact_texts, n_facts = self._fit_tail(list(facts), min(room, self.caps["facts"]), str)
+        room -= n_facts
+        # context keeps its own cap plus whatever the other sections didn't use
+        spare = sum(self.caps[s] for s in ("summary", "window", "facts")) - n_summary - n_window - n_facts
+        context_msg, n_context = self._fit_context(
+            snippets, min(room, self.caps["context"] + max(0, spare)), usage
+        )
+
+        messages: List[BaseMessage] = [SystemMessage(content=system)]
+        if summary_msg:
+            messages.append(SystemMessage(content=summary_msg))
+        if context_msg:
+            messages.append(SystemMessage(content=context_msg))
+        messages.extend(window_msgs)
+        messages.extend(SystemMessage(content=f) for f in fact_texts)
+        messages.append(HumanMessage(content=user_text))
+
+        usage.sections = {
+            "system": self._size(system),
+            "summary": n_summary,
+            "context": n_context,
+            "window": n_window,
+            "facts": n_facts,
+            "user": self._size(user_text),
+        }
+        return messages, usage
+
+    # ------------------------------------------------------------------ #
+    # Internal helpers                                                   #
+    # ------------------------------------------------------------------ #
+    def _size(self, text: str) -> int:
+        return count_tokens(text, self.encoding) + MESSAGE_OVERHEAD
+
+    def _fit_summary(self, summary: str, budget: int) -> Tuple[str, int]:
+        if not summary or budget <= MESSAGE_OVERHEAD:
+            return "", 0
+        text = truncate_tokens(summary, budget - MESSAGE_OVERHEAD, self.encoding)
+        return text, self._size(text)
+
+    def _fit_tail(self, items: list, budget: int, text_of) -> Tuple[list, int]:
+        """Newest items that fit, in original order."""
+        kept, used = [], 0
+        for item in reversed(items):
+            n = self._size(text_of(item))
+            if used + n > budget:
+                break
+            kept.append(item)
+            used += n
+        return kept[::-1], used
+
+    def _fit_context(
+        self, snippets: Sequence[Tuple[int, str]], budget: int, usage: PromptUsage
+    ) -> Tuple[str, int]:
+        header = "Context:\n"
+        used = self._size(header)
+        if not snippets or budget <= used:
+            usage.dropped = [cid for cid, _ in snippets]
+            return "", 0
+
+        parts: List[str] = []
+        seen: List[str] = []
+        for cid, text in snippets:
+            norm = _norm(text)
+            if any(norm in s for s in seen):  # same passage, or contained in a better one
+                usage.duplicates.append(cid)
+                continue
+            block = f"[#{cid}]\n{text}"
+            n = count_tokens(block, self.encoding) + 2  # "\n\n" separator
+            if used + n > budget:
+                left = budget - used - 2
+                if left < _MIN_TRUNCATED:
+                    usage.dropped.append(cid)
+                    continue
+                block = truncate_tokens(block, left, self.encoding) + " …"
+                n = count_tokens(block, self.encoding) + 2
+                usage.truncated.append(cid)
+            parts.append(block)
+            seen.append(norm)
+            usage.kept.append(cid)
+            used += n
+
+        if not parts:
+            return "", 0
+        text = header + "\n\n".join(parts)
+        return text, self._size(text)
@@ -0,0 +1,94 @@
+"""CPU cross-encoder reranking between FIRST_K candidates and FINAL_K context."""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import streamlit as st
+
+
+@dataclass
+class RerankStats:
+    calls: int = 0
+    scored: int = 0
+    cache_hits: int = 0
+    budget_cutoffs: int = 0
+    seconds: float = 0.0
+
+
+class CrossEncoderReranker:
+    """Scores (query, passage) pairs in batches with a cache and a time budget.
+
+    Candidates arrive in first-stage order.  Batches are scored front to back
+    until the next batch would overrun ``budget_ms``; anything left unscored
+    keeps its first-stage order behind the scored candidates.
+    """
+
+    def __init__(self, model, batch_size: int = 16, budget_ms: int = 800, cache_size: int = 4096):
+        self.model = model
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.stats = RerankStats()
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def rerank(self, query: str, texts: Sequence[str], top_n: int) -> List[int]:
+        """Indices of the best ``top_n`` texts, best first."""
+        if top_n <= 0 or not texts:
+            return []
+        start = time.perf_counter()
+        keys = [self._key(query, t) for t in texts]
+        scores: dict = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+        self.stats.cache_hits += len(scores)
+
+        todo = [i for i in range(len(texts)) if i not in scores]
+        last_batch = 0.0
+        for b in range(0, len(todo), self.batch_size):
+            elapsed = time.perf_counter() - start
+            if b and (elapsed + last_batch) * 1000 > self.budget_ms:
+                self.stats.budget_cutoffs += 1
+                break
+            batch = todo[b : b + self.batch_size]
+            t0 = time.perf_counter()
+            out = self.model.predict(
+                [(query, texts[i]) for i in batch], batch_size=self.batch_size
+            )
+            last_batch = time.perf_counter() - t0
+            with self._lock:
+                for i, score in zip(batch, out):
+                    scores[i] = float(score)
+                    self._cache[keys[i]] = float(score)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+            self.stats.scored += len(batch)
+
+        scored = sorted(scores, key=scores.get, reverse=True)
+        unscored = [i for i in range(len(texts)) if i not in scores]
+        self.stats.calls += 1
+        self.stats.seconds += time.perf_counter() - start
+        return (scored + unscored)[:top_n]
+
+    @staticmethod
+    def _key(query: str, text: str) -> str:
+        return hashlib.sha1(f"{query}\0{text}".encode("utf-8")).hexdigest()
+
+
+@st.cache_resource(show_spinner="Loading reranker…")
+def get_reranker(model_name: str, batch_size: int, budget_ms: int) -> CrossEncoderReranker | None:
+    """Process-wide reranker, or None if sentence-transformers can't load it."""
+    try:
+        from sentence_transformers import CrossEncoder  # heavy (torch): import lazily
+        model = CrossEncoder(model_name, device="cpu")
+    except Exception:
+        return None
+    return CrossEncoderReranker(model, batch_size=batch_size, budget_ms=budget_ms)
@@ -0,0 +1,196 @@
+"""Search primitives over a class index: dense FAISS, BM25, and their fusion."""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from science.lexical_index import LexicalIndex, rrf_scores
+
+
+@dataclass
+class Hit:
+    """One retrieved chunk.
+
+    ``distance`` is the FAISS score when dense-matched and ``bm25`` the
+    lexical score when keyword-matched; ``score`` is the fused (RRF) score;
+    ``shard`` names the class a cross-class hit came from.
+    """
+    doc_id: str
+    doc: Document
+    distance: float | None = None
+    score: float = 0.0
+    shard: str | None = None
+    bm25: float | None = None
+
+
+def source_name(doc: Document) -> str:
+    return os.path.basename(doc.metadata.get("source") or doc.metadata.get("file_path", ""))
+
+
+def fetch_documents(vector_store: FAISS, ids: Iterable[str]) -> Dict[str, Document]:
+    """Text + metadata for just these ids (one query on the SQLite store)."""
+    docstore = vector_store.docstore
+    if hasattr(docstore, "mget"):
+        return docstore.mget(ids)
+    return {i: docstore.search(i) for i in ids}
+
+
+def embed_query(vector_store: FAISS, query: str) -> np.ndarray:
+    vec = np.asarray([vector_store.embeddings.embed_query(query)], dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        faiss.normalize_L2(vec)
+    return vec
+
+
+class SourceIndex:
+    """Source file name → FAISS positions and docstore ids for one store.
+
+    Built once per index version so "only these docs" searches can hand
+    FAISS an ID selector instead of post-filtering metadata in Python.
+    """
+
+    def __init__(self, vector_store: FAISS):
+        self._positions: Dict[str, List[int]] = {}
+        self._ids: Dict[str, List[str]] = {}
+        docstore = vector_store.docstore
+        names = docstore.source_names() if hasattr(docstore, "source_names") else None
+        for pos, doc_id in vector_store.index_to_docstore_id.items():
+            name = names[doc_id] if names is not None else source_name(docstore.search(doc_id))
+            self._positions.setdefault(name, []).append(int(pos))
+            self._ids.setdefault(name, []).append(doc_id)
+
+    def positions(self, names: Iterable[str]) -> np.ndarray:
+        return np.asarray(
+            sorted(p for n in set(names) for p in self._positions.get(n, ())), dtype=np.int64
+        )
+
+    def ids(self, names: Iterable[str]) -> Set[str]:
+        return {i for n in set(names) for i in self._ids.get(n, ())}
+
+
+def _selector_params(index, positions: np.ndarray):
+    """SearchParameters of the right subclass for ``index`` restricted to positions."""
+    selector = faiss.IDSelectorBatch(positions)
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch), selector
+    try:
+        ivf = faiss.extract_index_ivf(base)
+    except RuntimeError:
+        return faiss.SearchParameters(sel=selector), selector
+    return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe), selector
+
+
+def _exact_subset(index, qvec: np.ndarray, positions: np.ndarray, k: int):
+    """Brute-force L2 over just the selected vectors (cost ∝ len(positions))."""
+    vecs = index.reconstruct_batch(positions)
+    dist = ((vecs - qvec) ** 2).sum(axis=1)
+    order = np.argsort(dist)[:k]
+    return dist[order][None, :], positions[order][None, :]
+
+
+def dense_search(
+    vector_store: FAISS,
+    qvec: np.ndarray,
+    k: int,
+    threshold: float | None = None,
+    positions: np.ndarray | None = None,
+) -> List[Hit]:
+    """Top-k by vector distance, optionally restricted to FAISS ``positions``.
+
+    Restricted searches use an ID selector, so FAISS only scores the
+    selected vectors and the result is never cut short by post-filtering.
+    """
+    index = vector_store.index
+    if positions is None:
+        distances, found = index.search(qvec, min(k, index.ntotal))
+    elif len(positions) == 0:
+        return []
+    else:
+        want = min(k, len(positions))
+        params, _selector = _selector_params(index, positions)  # keep selector alive
+        distances, found = index.search(qvec, want, params=params)
+        if int((found[0] != -1).sum()) < want:  # approximate index came back short
+            distances, found = _exact_subset(index, qvec, positions, want)
+
+    kept = [
+        (vector_store.index_to_docstore_id[int(pos)], float(dist))
+        for dist, pos in zip(distances[0], found[0])
+        if pos != -1 and (threshold is None or dist <= threshold)
+    ]
+    docs = fetch_documents(vector_store, [i for i, _ in kept])
+    return [Hit(doc_id, docs[doc_id], dist) for doc_id, dist in kept if doc_id in docs]
+
+
+def hybrid_search(
+    vector_store: FAISS,
+    lexical: LexicalIndex | None,
+    query: str,
+    qvec: np.ndarray,
+    k: int,
+    threshold: float | None = None,
+    positions: np.ndarray | None = None,
+    allowed_ids: Set[str] | None = None,
+    rrf_k: int = 60,
+    lex_scores: Dict[str, float] | None = None,
+) -> List[Hit]:
+    """Dense + BM25 candidates merged with reciprocal rank fusion.
+
+    ``positions`` / ``allowed_ids`` restrict the dense and lexical sides to
+    the same subset of chunks (see `SourceIndex`); ``lex_scores`` reuses a
+    BM25 pass already computed for this query.
+    """
+    dense = dense_search(vector_store, qvec, k, threshold, positions)
+    if lexical is None:
+        scores = rrf_scores([h.doc_id for h in dense], k=rrf_k)
+        for h in dense:
+            h.score = scores[h.doc_id]
+        return dense
+
+    by_id: Dict[str, Hit] = {h.doc_id: h for h in dense}
+    keep = allowed_ids.__contains__ if allowed_ids is not None else None
+    lex = lexical.search(query, k, keep=keep, scores=lex_scores)
+    missing = [doc_id for doc_id, _ in lex if doc_id not in by_id]
+    for doc_id, doc in fetch_documents(vector_store, missing).items():
+        by_id[doc_id] = Hit(doc_id, doc)
+    for doc_id, bm25 in lex:
+        if doc_id in by_id:
+            by_id[doc_id].bm25 = bm25
+
+    scores = rrf_scores([h.doc_id for h in dense], [i for i, _ in lex], k=rrf_k)
+    fused = []
+    for doc_id in sorted(scores, key=scores.get, reverse=True):
+        if doc_id in by_id:
+            by_id[doc_id].score = scores[doc_id]
+            fused.append(by_id[doc_id])
+    return fused[:k]
+
+
+def merge_hits(hit_lists: Iterable[List[Hit]], k: int, rrf_k: int = 60) -> List[Hit]:
+    """Top ``k`` across independently searched indexes, fused as one ranking.
+
+    Each index's own RRF scores aren't comparable (every index has a rank
+    1), so the hits are re-ranked together: dense distances are comparable
+    across indexes built with the same embedding model and searched with
+    the same query vector, BM25 scores roughly so, and one RRF over those
+    two global rankings decides.  A shard that matches much better than
+    the others can therefore fill the whole top ``k``.
+    """
+    merged = [h for hits in hit_lists for h in hits]
+
+    def key(h: Hit):
+        return h.shard, h.doc_id  # chunk ids repeat when a file is in two classes
+
+    dense = sorted((h for h in merged if h.distance is not None), key=lambda h: h.distance)
+    lexical = sorted((h for h in merged if h.bm25 is not None), key=lambda h: -h.bm25)
+    scores = rrf_scores([key(h) for h in dense], [key(h) for h in lexical], k=rrf_k)
+    for h in merged:
+        h.score = scores.get(key(h), 0.0)
+    merged.sort(key=lambda h: (-h.score, h.distance if h.distance is not None else np.inf))
+    return merged[:k]
@@ -0,0 +1,119 @@
+"""Fan one query out over every class's index ("All classes" mode)."""
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import streamlit as st
+
+from science.retrieval import Hit, hybrid_search, merge_hits
+
+ShardLoader = Callable[[], object]  # → ClassIndex, or None if the class has no index
+
+
+@dataclass
+class ShardStats:
+    answered: List[str] = field(default_factory=list)
+    late: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    ms: Dict[str, float] = field(default_factory=dict)
+
+
+@st.cache_resource(show_spinner=False)
+def get_shard_pool(workers: int) -> ThreadPoolExecutor:
+    """Shared by all sessions; FAISS and SQLite release the GIL while searching."""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard")
+
+
+def _search_one(
+    name: str, loader: ShardLoader, query: str, qvec: np.ndarray, k: int,
+    threshold: float | None, rrf_k: int,
+) -> Tuple[List[Hit], float]:
+    start = time.perf_counter()
+    index = loader()  # a registry hit once the shard has been opened
+    if index is None:
+        return [], 0.0
+    hits = hybrid_search(
+        index.vector_store, index.lexical, query, qvec, k,
+        threshold=threshold, rrf_k=rrf_k, lex_scores=index.lexical.score_all(query),
+    )
+    for h in hits:
+        h.shard = name
+    return hits, (time.perf_counter() - start) * 1000
+
+
+def search_shards(
+    pool: ThreadPoolExecutor,
+    loaders: Dict[str, ShardLoader],
+    query: str,
+    qvec: np.ndarray,
+    k: int,
+    budget_ms: float,
+    threshold: float | None = None,
+    rrf_k: int = 60,
+) -> Tuple[List[Hit], ShardStats]:
+    """Top-k across shards, fused globally (see `merge_hits`), within ``budget_ms``.
+
+    Shards still running at the deadline are left to finish in the
+    background (which also warms a cold shard for the next turn), but
+    their results never reach this answer.
+    """
+    futures = {
+        pool.submit(_search_one, name, loader, query, qvec, k, threshold, rrf_k): name
+        for name, loader in loaders.items()
+    }
+    done, pending = wait(futures, timeout=budget_ms / 1000)
+    stats = ShardStats()
+    answers: List[List[Hit]] = []
+    for fut in done:
+        name = futures[fut]
+        try:
+            hits, ms = fut.result()
+        except Exception as exc:  # one broken shard must not sink the turn
+            stats.failed[name] = f"{type(exc).__name__}: {exc}"
+            continue
+        stats.answered.append(name)
+        stats.ms[name] = round(ms, 1)
+        answers.append(hits)
+    for fut in pending:
+        fut.cancel()  # no-op if it already started
+        stats.late.append(futures[fut])
+
+    return merge_hits(answers, k, rrf_k), stats
+
+
+if __name__ == "__main__":  # python -m science.shard_search — merge self-check
+    from types import SimpleNamespace
+
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.embeddings import FakeEmbeddings
+    from langchain_community.vectorstores import FAISS
+
+    from science.lexical_index import LexicalIndex
+
+    rng = np.random.default_rng(0)
+    dim, per_shard, k = 16, 20, 5
+    qvec = rng.normal(size=(1, dim)).astype(np.float32)
+
+    def shard(name: str, spread: float, text: str):
+        vecs = qvec + spread * rng.normal(size=(per_shard, dim)).astype(np.float32)
+        ids = [f"{name}:{i}" for i in range(per_shard)]
+        store = FAISS(FakeEmbeddings(size=dim), faiss.IndexFlatL2(dim), InMemoryDocstore(), {})
+        store.add_embeddings(zip([text] * per_shard, vecs.tolist()), ids=ids)
+        lexical = LexicalIndex()
+        lexical.add(ids, [text] * per_shard)
+        return lambda: SimpleNamespace(vector_store=store, lexical=lexical)
+
+    loaders = {
+        "relevant": shard("relevant", 0.01, "duty of care negligence"),
+        "unrelated": shard("unrelated", 10.0, "share placing timetable"),
+    }
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        hits, _ = search_shards(pool, loaders, "negligence duty", qvec, k, budget_ms=10_000)
+    shards = [h.shard for h in hits]
+    assert shards == ["relevant"] * k, shards
+    print(f"ok: top {k} all from the relevant shard")
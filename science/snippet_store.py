@@ -0,0 +1,68 @@
+"""Process-wide passage text for citations, stored once per (class, chunk id)."""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+import streamlit as st
+
+SnippetKey = Tuple[str, str]  # (class name, chunk/vector id)
+
+
+class SnippetStore:
+    """Deduplicated LRU of cited passages shared by every session.
+
+    Chat messages keep only a `SnippetKey` per citation; the text lives
+    here once, however many turns or sessions cite it.  Past ``max_bytes``
+    the least recently used passages are dropped; a reply citing one of
+    those shows it as not found.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._texts: "OrderedDict[SnippetKey, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def put(self, key: SnippetKey, text: str) -> None:
+        with self._lock:
+            if key in self._texts:
+                self._texts.move_to_end(key)
+                return
+            self._texts[key] = text
+            self._bytes += len(text)
+            while self._bytes > self.max_bytes and len(self._texts) > 1:
+                _, old = self._texts.popitem(last=False)
+                self._bytes -= len(old)
+                self.evictions += 1
+
+    def get_many(self, keys: Iterable[SnippetKey]) -> Dict[SnippetKey, str]:
+        out: Dict[SnippetKey, str] = {}
+        with self._lock:
+            for key in keys:
+                text = self._texts.get(key)
+                if text is None:
+                    self.misses += 1
+                    continue
+                self._texts.move_to_end(key)
+                self.hits += 1
+                out[key] = text
+        return out
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._texts),
+                "size_mb": round(self._bytes / 2**20, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_snippet_store(max_mb: int) -> SnippetStore:
+    """One store per server process, shared by every Streamlit session."""
+    return SnippetStore(max_bytes=max_mb * 2**20)
@@ -0,0 +1,46 @@
+"""Local tokenizer helpers shared by chunking, batching and prompt budgets."""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterator, Tuple
+
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    return tiktoken.get_encoding(name)
+
+
+def count_tokens(text: str, encoding: str = "cl100k_base") -> int:
+    return len(_encoding(encoding).encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, encoding: str = "cl100k_base") -> str:
+    """First ``max_tokens`` tokens of ``text`` (the whole text if it fits)."""
+    enc = _encoding(encoding)
+    ids = enc.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    return enc.decode(ids[:max(0, max_tokens)])
+
+
+def token_windows(
+    text: str, max_tokens: int, encoding: str = "cl100k_base"
+) -> Iterator[Tuple[int, int]]:
+    """Character spans of consecutive runs of at most ``max_tokens`` tokens."""
+    enc = _encoding(encoding)
+    ids = enc.encode(text, disallowed_special=())
+    _, offsets = enc.decode_with_offsets(ids)
+    max_tokens = max(1, max_tokens)
+    i = 0
+    while i < len(ids):
+        j = min(i + max_tokens, len(ids))
+        end = offsets[j] if j < len(ids) else len(text)
+        # a cut inside a multi-token character moves it whole into this span
+        while j > i + 1 and count_tokens(text[offsets[i]:end], encoding) > max_tokens:
+            j -= 1
+            end = offsets[j]
+        if end > offsets[i]:
+            yield offsets[i], end
+        i = j
@@ -0,0 +1,112 @@
+"""Per-turn timing spans written to a rotating JSONL file.
+
+Spans carry sizes, counts and cache hits only — never prompt or answer
+text — so the trace file is safe to keep next to the server logs.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Iterator, List
+
+import streamlit as st
+
+
+@dataclass
+class Span:
+    name: str
+    start_ms: float
+    duration_ms: float = 0.0
+    attrs: Dict = field(default_factory=dict)
+
+
+class Trace:
+    """Spans for one chat turn, timed relative to the start of the turn."""
+
+    def __init__(self, kind: str = "rag", **attrs):
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.attrs = dict(attrs)
+        self.spans: List[Span] = []
+        self._t0 = time.perf_counter()
+        self._wall = time.time()
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict]:
+        """Time the block; the yielded dict collects attributes for the span."""
+        s = Span(name, self._ms())
+        s.attrs.update(attrs)
+        try:
+            yield s.attrs
+        finally:
+            s.duration_ms = self._ms() - s.start_ms
+            self.spans.append(s)
+
+    def record(self, name: str, start_ms: float, duration_ms: float, **attrs) -> None:
+        """Add a span timed elsewhere (e.g. across a generator's lifetime)."""
+        self.spans.append(Span(name, start_ms, duration_ms, dict(attrs)))
+
+    def now_ms(self) -> float:
+        return self._ms()
+
+    def to_dict(self) -> Dict:
+        return {
+            "turn_id": self.turn_id,
+            "ts": round(self._wall, 3),
+            "kind": self.kind,
+            "total_ms": round(self._ms(), 1),
+            **self.attrs,
+            "spans": [
+                {
+                    "name": s.name,
+                    "start_ms": round(s.start_ms, 1),
+                    "duration_ms": round(s.duration_ms, 1),
+                    **s.attrs,
+                }
+                for s in sorted(self.spans, key=lambda s: s.start_ms)
+            ],
+        }
+
+    def _ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+
+class TraceSink:
+    """Thread-safe JSONL writer that rotates at ``max_bytes``."""
+
+    def __init__(self, path: str, max_bytes: int, backups: int = 3):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._log = logging.getLogger(f"turn-trace:{os.path.abspath(path)}")
+        self._log.setLevel(logging.INFO)
+        self._log.propagate = False
+        if not self._log.handlers:
+            handler = RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log.addHandler(handler)
+
+    def write(self, trace: Trace) -> Dict:
+        record = trace.to_dict()
+        self._log.info(json.dumps(record, separators=(",", ":")))
+        return record
+
+
+@st.cache_resource(show_spinner=False)
+def get_trace_sink(path: str, max_mb: int, backups: int) -> TraceSink:
+    """One sink (one file handle) per server process."""
+    return TraceSink(path, max_mb * 1024 * 1024, backups)
+
+
+def span_durations(record: Dict) -> Dict[str, float]:
+    """{span name: total ms} for one written trace, for the sidebar table."""
+    out: Dict[str, float] = {}
+    for s in record.get("spans", []):
+        out[s["name"]] = round(out.get(s["name"], 0.0) + s["duration_ms"], 1)
+    return out